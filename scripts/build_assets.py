@@ -10,74 +10,95 @@
 """
 
 import argparse
+import hashlib
+import itertools
+import mmap
+import re
 import os
 import shutil
 import sys
 import json
 import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-def ensure_dir(directory):
-    """确保目录存在，如果不存在则创建"""
-    os.makedirs(directory, exist_ok=True)
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+# 预编译的 struct 格式（assets.bin 索引表项和头部）
+_ENTRY_FMT = struct.Struct('<32sIIHH')  # name, file_size, offset, width, height
+_HDR_FMT = struct.Struct('<III')        # total_files, checksum, data_length
 
-def copy_file(src, dst):
-    """复制文件"""
-    if os.path.exists(src):
-        shutil.copy2(src, dst)
-        print(f"已复制: {src} -> {dst}")
-        return True
-    else:
-        print(f"警告: 源文件不存在: {src}")
-        return False
+# 预编译的 struct 格式（srmodels.bin 头部），'32s' 自动补零
+_U32_FMT = struct.Struct('<I')
+_MODEL_FMT = struct.Struct('<32sI')   # model_name, file_number
+_FILE_FMT = struct.Struct('<32sII')   # file_name, file_start, file_len
 
 
-def copy_directory(src, dst):
-    """复制目录"""
-    if os.path.exists(src):
-        shutil.copytree(src, dst, dirs_exist_ok=True)
-        print(f"已复制目录: {src} -> {dst}")
-        return True
-    else:
-        print(f"警告: 源目录不存在: {src}")
-        return False
+def ensure_dir(directory):
+    """确保目录存在，如果不存在则创建"""
+    os.makedirs(directory, exist_ok=True)
 
 
-def struct_pack_string(string, max_len=None):
+def scan_model_tree(root, rel_prefix=''):
     """
-    将字符串打包为二进制数据
-    如果 max_len 为 None，则 max_len = len(string)
-    否则如果 len(string) < max_len，剩余部分用 \x00 填充
+    递归扫描模型目录，产出 (相对路径, 绝对路径, 大小)
+    条目按名称排序，保证打包顺序与文件系统无关；
+    大小取自 DirEntry 缓存的 stat，不额外发起系统调用
     """
-    if max_len is None:
-        max_len = len(string)
-    else:
-        assert len(string) <= max_len
-
-    left_num = max_len - len(string)
-    out_bytes = None
-    for char in string:
-        if out_bytes is None:
-            out_bytes = struct.pack('b', ord(char))
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from scan_model_tree(entry.path, rel_prefix + entry.name + os.sep)
         else:
-            out_bytes += struct.pack('b', ord(char))
-    for i in range(left_num):
-        out_bytes += struct.pack('x')  # 填充空字节
-    return out_bytes
+            yield (rel_prefix + entry.name, entry.path,
+                   entry.stat(follow_symlinks=False).st_size)
 
 
-def read_data(filename):
-    """读取二进制数据"""
-    with open(filename, "rb") as f:
-        return f.read()
+def open_file_payload(file_path):
+    """打开单个文件内容，返回可直接写入输出的缓冲对象
 
-
-def pack_models(model_path, out_file="srmodels.bin"):
+    优先 mmap 源文件（并提示内核预读），把映射直接交给带缓冲的 write，
+    省去一次用户态读取拷贝；空文件或 mmap 失败时退回普通 read。
+    在线程池中调用时 open/mmap/read 都会释放 GIL，可与写出重叠
     """
-    将所有模型打包成一个二进制文件
-    
+    with open(file_path, "rb") as src:
+        size = os.fstat(src.fileno()).st_size
+        if size > 0:
+            try:
+                mm = mmap.mmap(src.fileno(), size, access=mmap.ACCESS_READ)
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_WILLNEED)
+                return mm
+            except (ValueError, OSError):
+                pass
+        return src.read()
+
+
+def write_file_payload(dst, payload):
+    """把 open_file_payload 返回的缓冲写入输出并释放"""
+    dst.write(payload)
+    if isinstance(payload, mmap.mmap):
+        payload.close()
+
+
+def pack_models(sources, out_path):
+    """
+    将所有模型直接从源目录打包成一个二进制文件
+
+    参数:
+        sources: [(model_name, model_dir), ...] 模型源目录列表
+        out_path: 输出文件路径
+
     格式:
     {
         model_num: int (4 bytes)
@@ -100,110 +121,139 @@ def pack_models(model_path, out_file="srmodels.bin"):
         ...
     }
     """
-    models = {}
-    file_num = 0
-    model_num = 0
-    
-    # 遍历模型目录（只处理直接子目录）
-    if not os.path.exists(model_path):
-        print(f"错误: 模型路径不存在: {model_path}")
-        return False
-    
-    for model_name in os.listdir(model_path):
-        model_dir = os.path.join(model_path, model_name)
-        if os.path.isdir(model_dir):
-            models[model_name] = {}
-            # 遍历模型目录中的所有文件（包括子目录）
-            for root, dirs, files in os.walk(model_dir):
-                for file_name in files:
-                    file_num += 1
-                    file_path = os.path.join(root, file_name)
-                    # 保持相对路径结构
-                    rel_path = os.path.relpath(file_path, model_dir)
-                    models[model_name][rel_path] = read_data(file_path)
-    
-    if not models:
+    # 第一遍: 只收集文件布局到一个平铺列表 (模型名, 相对路径, 绝对路径, 大小)，
+    # 不读取内容；条目按模型顺序追加，天然分组
+    entries = []
+    model_names = []
+    for model_name, model_dir in sources:
+        model_dir = os.path.normpath(model_dir)  # 去掉末尾分隔符，保证切片对齐
+        if model_name in model_names:
+            # 重复的模型名会让分组后的文件数对不上预计算的头部长度，
+            # 偏移全部错位，只保留第一次出现
+            print(f"警告: 模型重复，跳过: {model_name}")
+            continue
+        if not os.path.isdir(model_dir):
+            print(f"警告: 模型目录不存在: {model_dir}")
+            continue
+        model_names.append(model_name)
+        # 遍历模型目录中的所有文件（包括子目录，保持相对路径结构）
+        for rel_path, file_path, file_size in scan_model_tree(model_dir):
+            entries.append((model_name, rel_path, file_path, file_size))
+
+    if not model_names:
         print("警告: 没有找到任何模型")
         return False
-    
-    model_num = len(models)
+
+    model_num = len(model_names)
+    file_num = len(entries)
     # 计算头部长度: model_num(4) + 每个模型的元数据
     header_len = 4 + model_num * (32 + 4) + file_num * (32 + 4 + 4)
-    
-    out_bin = struct.pack('I', model_num)  # 模型数量
-    data_bin = None
-    
-    # 构建模型信息表和数据
-    for key in models:
-        model_bin = struct_pack_string(key, 32)  # 模型名称
-        model_bin += struct.pack('I', len(models[key]))  # 文件数量
-        
-        for file_name in models[key]:
-            model_bin += struct_pack_string(file_name, 32)  # 文件名
-            if data_bin is None:
-                model_bin += struct.pack('I', header_len)  # 第一个文件的偏移
-                data_bin = models[key][file_name]
-                model_bin += struct.pack('I', len(models[key][file_name]))  # 文件长度
-            else:
-                model_bin += struct.pack('I', header_len + len(data_bin))  # 后续文件的偏移
-                data_bin += models[key][file_name]
-                model_bin += struct.pack('I', len(models[key][file_name]))  # 文件长度
-        
-        out_bin += model_bin
-    
-    assert len(out_bin) == header_len, f"头部长度不匹配: {len(out_bin)} != {header_len}"
-    
-    if data_bin is not None:
-        out_bin += data_bin
-    
-    out_file_path = os.path.join(model_path, out_file)
+
+    out_bin = bytearray()
+    out_bin.extend(_U32_FMT.pack(model_num))  # 模型数量
+    data_offset = header_len  # 下一个文件在输出中的偏移
+
+    # 构建模型信息表（'32s' 自动把名称补零到 32 字节）
+    grouped = {key: list(group) for key, group in
+               itertools.groupby(entries, key=lambda e: e[0])}
+    for key in model_names:
+        model_entries = grouped.get(key, [])
+        name = key.encode('utf-8')
+        assert len(name) <= 32, f"模型名称超过 32 字节: {key}"
+        out_bin.extend(_MODEL_FMT.pack(name, len(model_entries)))
+
+        for _model, rel_path, _file_path, file_size in model_entries:
+            file_name = rel_path.encode('utf-8')
+            assert len(file_name) <= 32, f"文件名超过 32 字节: {rel_path}"
+            out_bin.extend(_FILE_FMT.pack(file_name, data_offset, file_size))
+            data_offset += file_size
+
+    # 头部长度与预计算不符说明分组和条目数对不上，偏移必然全错，
+    # 宁可在这里炸掉也不要产出一个静默损坏的 srmodels.bin
+    assert len(out_bin) == header_len, \
+        f"头部长度不一致: {len(out_bin)} != {header_len}"
+
+    # 第二遍: 写入头部后把文件内容流式拷贝到输出，避免整体驻留内存
+    # 线程池按写出顺序预取最多 8 个文件，读盘与写出重叠
+    file_paths = [file_path for _model, _rel_path, file_path, _file_size in entries]
+    out_file_path = out_path
     with open(out_file_path, "wb") as f:
         f.write(out_bin)
-    
-    print(f"已生成: {out_file_path} (大小: {len(out_bin) / 1024:.2f} KB)")
+        with ThreadPoolExecutor(max_workers=min(8, max(1, len(file_paths)))) as pool:
+            paths_iter = iter(file_paths)
+            pending = deque(pool.submit(open_file_payload, p)
+                            for p in itertools.islice(paths_iter, 8))
+            while pending:
+                write_file_payload(f, pending.popleft().result())
+                for p in itertools.islice(paths_iter, 1):
+                    pending.append(pool.submit(open_file_payload, p))
+
+    print(f"已生成: {out_file_path} (大小: {data_offset / 1024:.2f} KB)")
     return True
 
 
+# 模型类型判定规则，按优先级排列（与原 if/elif 链语义一致）
+_MODEL_TYPE_PATTERNS = (
+    ('wakenet', re.compile(r'^wn|wakenet')),
+    ('vadnet', re.compile(r'^vadnet|vadn')),
+    ('nsnet', re.compile(r'^nsnet|nsn')),
+    ('multinet', re.compile(r'^mn|multinet')),
+)
+
+# multinet 模型名中的语言标记
+_CN_RE = re.compile(r'_cn|cn_')
+_EN_RE = re.compile(r'_en|en_')
+
+
 def detect_model_type(model_name):
     """
     自动检测模型类型
     返回: ('wakenet'|'vadnet'|'nsnet'|'multinet'|'unknown', model_name)
     """
     model_name_lower = model_name.lower()
-    
-    if model_name_lower.startswith('wn') or 'wakenet' in model_name_lower:
-        return ('wakenet', model_name)
-    elif model_name_lower.startswith('vadnet') or 'vadn' in model_name_lower:
-        return ('vadnet', model_name)
-    elif model_name_lower.startswith('nsnet') or 'nsn' in model_name_lower:
-        return ('nsnet', model_name)
-    elif model_name_lower.startswith('mn') or 'multinet' in model_name_lower:
-        return ('multinet', model_name)
-    else:
-        return ('unknown', model_name)
+
+    for model_type, pattern in _MODEL_TYPE_PATTERNS:
+        if pattern.search(model_name_lower):
+            return (model_type, model_name)
+    return ('unknown', model_name)
 
 
-def get_model_path(model_name, model_type, esp_sr_model_path):
+# 各模型类型在 ESP-SR 根目录下对应的子目录
+_MODEL_SUBDIRS = {
+    'wakenet': 'wakenet_model',
+    'vadnet': 'vadnet_model',
+    'nsnet': 'nsnet_model',
+    'multinet': 'multinet_model',
+}
+
+
+def index_sr_models(esp_sr_model_path):
+    """
+    扫描 ESP-SR 模型根目录一次，建立 (模型类型, 模型名称) -> 路径 的索引
+    后续按名称查找模型就不再需要逐个 stat
+    """
+    index = {}
+    for model_type, subdir in _MODEL_SUBDIRS.items():
+        try:
+            with os.scandir(os.path.join(esp_sr_model_path, subdir)) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        index[(model_type, entry.name)] = entry.path
+        except FileNotFoundError:
+            continue
+    return index
+
+
+def get_model_path(model_name, model_type, model_index):
     """
-    根据模型类型和名称获取完整路径
+    根据模型类型和名称从索引中获取完整路径
     返回模型路径，如果不存在则返回 None
     """
-    if model_type == 'wakenet':
-        model_path = os.path.join(esp_sr_model_path, 'wakenet_model', model_name)
-    elif model_type == 'vadnet':
-        model_path = os.path.join(esp_sr_model_path, 'vadnet_model', model_name)
-    elif model_type == 'nsnet':
-        model_path = os.path.join(esp_sr_model_path, 'nsnet_model', model_name)
-    elif model_type == 'multinet':
-        model_path = os.path.join(esp_sr_model_path, 'multinet_model', model_name)
-    else:
-        # 尝试作为完整路径
-        if os.path.exists(model_name):
-            return model_name
-        return None
-    
-    if os.path.exists(model_path):
-        return model_path
+    if model_type in _MODEL_SUBDIRS:
+        return model_index.get((model_type, model_name))
+    # 尝试作为完整路径
+    if os.path.exists(model_name):
+        return model_name
     return None
 
 
@@ -215,7 +265,8 @@ def get_model_paths(model_names, esp_sr_model_path):
     """
     if not model_names:
         return []
-    
+
+    model_index = index_sr_models(esp_sr_model_path)
     valid_models = []
     for model_name in model_names:
         # 如果是完整路径，直接使用
@@ -230,7 +281,7 @@ def get_model_paths(model_names, esp_sr_model_path):
         model_type, clean_name = detect_model_type(model_name)
         
         # 获取模型路径
-        model_path = get_model_path(clean_name, model_type, esp_sr_model_path)
+        model_path = get_model_path(clean_name, model_type, model_index)
         
         if model_path:
             print(f"找到 {model_type} 模型: {clean_name}")
@@ -241,6 +292,25 @@ def get_model_paths(model_names, esp_sr_model_path):
     return valid_models
 
 
+def compute_build_stamp(model_list, cn_wake_word, en_wake_word, threshold,
+                        pretty_index=False):
+    """
+    根据输入模型的元数据和构建参数计算指纹
+    任何模型文件或参数变化都会改变指纹，用于跳过重复构建
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((cn_wake_word, en_wake_word, threshold, pretty_index)).encode('utf-8'))
+    for model_type, model_name, model_path in model_list:
+        h.update(f"{model_type}:{model_name}:{model_path}".encode('utf-8'))
+        for root, dirs, files in os.walk(model_path):
+            dirs.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                stat = os.stat(file_path)
+                h.update(f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    return h.hexdigest()
+
+
 def get_languages_from_models(model_list):
     """
     从模型列表中检测语言（仅从 multinet 模型）
@@ -250,82 +320,60 @@ def get_languages_from_models(model_list):
         return []
     
     languages = set()
-    cn_indicators = ['_cn', 'cn_']
-    en_indicators = ['_en', 'en_']
-    
     for model_type, model_name, _ in model_list:
         if model_type == 'multinet':
-            if any(indicator in model_name for indicator in cn_indicators):
+            if _CN_RE.search(model_name):
                 languages.add('cn')
-            if any(indicator in model_name for indicator in en_indicators):
+            if _EN_RE.search(model_name):
                 languages.add('en')
-    
-    return sorted(list(languages)) if languages else []
 
+    return sorted(languages) if languages else []
 
-def process_sr_models(model_list, build_dir, assets_dir, esp_sr_model_path):
+
+def process_sr_models(model_list, assets_dir, esp_sr_model_path):
     """
     处理所有 SR 模型并生成 srmodels.bin
     支持 WakeNet、VADNet、NSNet、MultiNet 等多种模型类型
-    
+    直接从模型源目录打包，不经过中间拷贝
+
     参数:
         model_list: [(model_type, model_name, model_path), ...] 模型列表
-        build_dir: 构建目录
         assets_dir: assets 目录
         esp_sr_model_path: ESP-SR 模型根目录
-    
+
     返回生成的 srmodels.bin 文件名，如果失败则返回 None
     """
     if not model_list:
         return None
-    
-    # 创建 SR 模型构建目录
-    sr_models_build_dir = os.path.join(build_dir, "srmodels")
-    if os.path.exists(sr_models_build_dir):
-        shutil.rmtree(sr_models_build_dir)
-    os.makedirs(sr_models_build_dir)
-    
-    models_processed = 0
+
+    sources = []
     needs_fst = False
     multinet_models = []
-    
-    # 复制所有模型
+
+    # 收集所有模型源目录
     for model_type, model_name, model_path in model_list:
-        model_dst = os.path.join(sr_models_build_dir, model_name)
-        if copy_directory(model_path, model_dst):
-            models_processed += 1
-            print(f"已添加 {model_type} 模型: {model_name}")
-            
-            # 记录 multinet 模型，检查是否需要 fst
-            if model_type == 'multinet':
-                multinet_models.append(model_name)
-                if 'mn6' in model_name or 'mn7' in model_name:
-                    needs_fst = True
-    
+        sources.append((model_name, model_path))
+        print(f"已添加 {model_type} 模型: {model_name}")
+
+        # 记录 multinet 模型，检查是否需要 fst
+        if model_type == 'multinet':
+            multinet_models.append(model_name)
+            if 'mn6' in model_name or 'mn7' in model_name:
+                needs_fst = True
+
     # 如果使用 Multinet6/7，添加 fst 模型
     if needs_fst:
         fst_model_path = os.path.join(esp_sr_model_path, 'multinet_model', 'fst')
         if os.path.exists(fst_model_path):
-            fst_dst = os.path.join(sr_models_build_dir, 'fst')
-            if copy_directory(fst_model_path, fst_dst):
-                models_processed += 1
-                print(f"已添加 fst 模型 (Multinet6/7 必需)")
-            else:
-                print("警告: 无法复制 fst 模型，Multinet6/7 可能无法正常工作")
+            sources.append(('fst', fst_model_path))
+            print(f"已添加 fst 模型 (Multinet6/7 必需)")
         else:
             print(f"警告: fst 模型目录不存在: {fst_model_path}")
-    
-    if models_processed == 0:
-        print("警告: 没有成功处理任何 SR 模型")
-        return None
-    
-    # 使用 pack_models 函数生成 srmodels.bin
-    srmodels_output = os.path.join(sr_models_build_dir, "srmodels.bin")
+
+    # 使用 pack_models 函数直接生成 assets 目录下的 srmodels.bin
     try:
-        if pack_models(sr_models_build_dir, "srmodels.bin"):
-            # 复制 srmodels.bin 到 assets 目录
-            copy_file(srmodels_output, os.path.join(assets_dir, "srmodels.bin"))
-            print(f"成功打包 {models_processed} 个模型到 srmodels.bin")
+        if pack_models(sources, os.path.join(assets_dir, "srmodels.bin")):
+            print(f"成功打包 {len(sources)} 个模型到 srmodels.bin")
             return "srmodels.bin"
         else:
             return None
@@ -336,10 +384,11 @@ def process_sr_models(model_list, build_dir, assets_dir, esp_sr_model_path):
         return None
 
 
-def generate_index_json(assets_dir, srmodels, multinet_model_info):
+def generate_index_json(assets_dir, srmodels, multinet_model_info, pretty=False):
     """
     生成 index.json 文件
     支持多语言配置
+    默认写紧凑格式；pretty=True 时缩进输出便于调试
     """
     index_data = {
         "version": 1
@@ -351,17 +400,29 @@ def generate_index_json(assets_dir, srmodels, multinet_model_info):
     if multinet_model_info:
         index_data["multinet_model"] = multinet_model_info
     
-    # 写入 index.json
+    # 写入 index.json（紧凑格式，固件解析不依赖缩进；优先用 orjson）
     index_path = os.path.join(assets_dir, "index.json")
-    with open(index_path, 'w', encoding='utf-8') as f:
-        json.dump(index_data, f, indent=4, ensure_ascii=False)
-    
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        with open(index_path, 'wb') as f:
+            f.write(orjson.dumps(index_data, option=option))
+    else:
+        with open(index_path, 'w', encoding='utf-8') as f:
+            if pretty:
+                json.dump(index_data, f, ensure_ascii=False, indent=4)
+            else:
+                json.dump(index_data, f, ensure_ascii=False, separators=(',', ':'))
+
     print(f"已生成: {index_path}")
     return True
 
 
 def compute_checksum(data):
     """计算校验和"""
+    if np is not None:
+        # C 级向量化求和，比逐字节的 Python 循环快几个数量级
+        arr = np.frombuffer(data, dtype=np.uint8)
+        return int(arr.sum(dtype=np.uint64)) & 0xFFFF
     return sum(data) & 0xFFFF
 
 
@@ -376,68 +437,70 @@ def pack_assets_simple(target_path, include_path, out_file, assets_path, max_nam
     简化版的 assets 打包函数
     将 assets 目录中的所有文件打包成 assets.bin
     """
-    merged_data = bytearray()
     file_info_list = []
     skip_files = ['config.json']
-    
+
     # 确保输出目录存在
-    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    out_dir = os.path.dirname(out_file)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
     os.makedirs(include_path, exist_ok=True)
     
-    # 获取文件列表并排序
-    file_list = sorted([f for f in os.listdir(target_path) 
-                       if os.path.isfile(os.path.join(target_path, f)) and f not in skip_files], 
-                      key=sort_key)
-    
-    for filename in file_list:
-        file_path = os.path.join(target_path, filename)
-        file_name = os.path.basename(file_path)
-        file_size = os.path.getsize(file_path)
-        
-        file_info_list.append((file_name, len(merged_data), file_size, 0, 0))
+    # 获取文件列表并排序（os.scandir 的 DirEntry 缓存了类型和大小，免去逐项 stat）
+    with os.scandir(target_path) as entries:
+        file_list = sorted([(e.name, e.path, e.stat().st_size) for e in entries
+                            if e.is_file() and e.name not in skip_files],
+                           key=lambda item: sort_key(item[0]))
+
+    # 预分配负载缓冲（每个文件前有 2 字节 0x5A5A 前缀），一次到位，
+    # 避免 bytearray 增长时反复搬迁；readinto 直接读进缓冲，不产生中间对象
+    merged_data = bytearray(sum(size + 2 for _name, _path, size in file_list))
+    payload_view = memoryview(merged_data)
+    pos = 0
+    for file_name, file_path, file_size in file_list:
+        file_info_list.append((file_name, pos, file_size, 0, 0))
         # 添加 0x5A5A 前缀
-        merged_data.extend(b'\x5A\x5A')
-        
+        merged_data[pos:pos + 2] = b'\x5A\x5A'
+        pos += 2
+
         with open(file_path, 'rb') as bin_file:
-            bin_data = bin_file.read()
-        merged_data.extend(bin_data)
-    
+            bin_file.readinto(payload_view[pos:pos + file_size])
+        pos += file_size
+
     total_files = len(file_info_list)
     
-    # 构建文件索引表
-    mmap_table = bytearray()
-    for file_name, offset, file_size, width, height in file_info_list:
+    # 构建文件索引表：预分配整表，逐项 pack_into，避免反复追加小对象
+    entry_fmt = (_ENTRY_FMT if max_name_len == 32
+                 else struct.Struct(f'<{max_name_len}sIIHH'))
+    mmap_table = bytearray(entry_fmt.size * total_files)
+    for i, (file_name, offset, file_size, width, height) in enumerate(file_info_list):
         if len(file_name) > max_name_len:
             print(f'警告: "{file_name}" 超过 {max_name_len} 字节，将被截断')
-        fixed_name = file_name.ljust(max_name_len, '\0')[:max_name_len]
-        mmap_table.extend(fixed_name.encode('utf-8'))
-        mmap_table.extend(file_size.to_bytes(4, byteorder='little'))
-        mmap_table.extend(offset.to_bytes(4, byteorder='little'))
-        mmap_table.extend(width.to_bytes(2, byteorder='little'))
-        mmap_table.extend(height.to_bytes(2, byteorder='little'))
-    
-    # 合并数据
-    combined_data = mmap_table + merged_data
-    combined_checksum = compute_checksum(combined_data)
-    combined_data_length = len(combined_data).to_bytes(4, byteorder='little')
-    
+        entry_fmt.pack_into(mmap_table, i * entry_fmt.size,
+                            file_name.encode('utf-8')[:max_name_len],
+                            file_size, offset, width, height)
+
+    # 校验和可分段计算（字节求和满足交换律），无需拼接出完整缓冲
+    combined_checksum = (compute_checksum(mmap_table) + compute_checksum(merged_data)) & 0xFFFF
+    combined_len = len(mmap_table) + len(merged_data)
+
     # 构建头部: total_files(4) + checksum(4) + data_length(4)
-    header_data = (total_files.to_bytes(4, byteorder='little') + 
-                   combined_checksum.to_bytes(4, byteorder='little') + 
-                   combined_data_length)
-    
-    final_data = header_data + combined_data
-    
-    # 写入输出文件
+    header_data = _HDR_FMT.pack(total_files, combined_checksum, combined_len)
+
+    # 分段写入输出文件，避免把头部/索引/数据再拼接一次
     with open(out_file, 'wb') as output_bin:
-        output_bin.write(final_data)
-    
-    print(f"已生成 assets.bin: {out_file} (大小: {len(final_data) / 1024:.2f} KB)")
+        output_bin.write(header_data)
+        output_bin.write(mmap_table)
+        output_bin.write(merged_data)
+
+    total_size = len(header_data) + combined_len
+    print(f"已生成 assets.bin: {out_file} (大小: {total_size / 1024:.2f} KB)")
     return True
 
 
-def build_assets(model_names, esp_sr_model_path, output_path, 
-                 cn_wake_word=None, en_wake_word=None, threshold=0.2):
+def build_assets(model_names, esp_sr_model_path, output_path,
+                 cn_wake_word=None, en_wake_word=None, threshold=0.2,
+                 pretty_index=False):
     """
     构建 assets.bin，支持多种模型类型
     
@@ -476,9 +539,22 @@ def build_assets(model_names, esp_sr_model_path, output_path,
         print(f"\n找到 {len(model_list)} 个模型:")
         for model_type, model_name, _ in model_list:
             print(f"  - {model_type}: {model_name}")
-        
+
+        # 输入和参数都没变时直接复用已有产物
+        build_stamp = compute_build_stamp(model_list, cn_wake_word, en_wake_word,
+                                          threshold, pretty_index)
+        stamp_path = output_path + '.stamp'
+        if os.path.exists(output_path) and os.path.exists(stamp_path):
+            try:
+                with open(stamp_path, 'r', encoding='utf-8') as f:
+                    if f.read().strip() == build_stamp:
+                        print(f"\n输入未变化，跳过构建: {output_path}")
+                        return True
+            except OSError:
+                pass
+
         # 处理 SR 模型，生成 srmodels.bin
-        srmodels = process_sr_models(model_list, temp_build_dir, assets_dir, esp_sr_model_path)
+        srmodels = process_sr_models(model_list, assets_dir, esp_sr_model_path)
         if not srmodels:
             print("错误: 生成 srmodels.bin 失败")
             return False
@@ -529,28 +605,26 @@ def build_assets(model_names, esp_sr_model_path, output_path,
                 print("提示: 未指定唤醒词，可在运行时通过 esp_mn_commands_add() 动态添加")
         
         # 生成 index.json
-        generate_index_json(assets_dir, srmodels, multinet_model_info)
+        generate_index_json(assets_dir, srmodels, multinet_model_info, pretty=pretty_index)
         
-        # 打包成 assets.bin
+        # 打包成 assets.bin，直接写到最终输出位置（先写临时文件再原子替换）
         include_path = os.path.join(temp_build_dir, "include")
-        image_file = os.path.join(temp_build_dir, "output", "assets.bin")
-        if not pack_assets_simple(assets_dir, include_path, image_file, "assets", 32):
-            return False
-        
-        # 复制最终文件到输出位置
-        if os.path.exists(image_file):
-            shutil.copy2(image_file, output_path)
-            print(f"成功生成 assets.bin: {output_path}")
-            
-            # 显示大小信息
-            total_size = os.path.getsize(output_path)
-            print(f"Assets 文件大小: {total_size / 1024:.2f} KB ({total_size} 字节)")
-            
-            return True
-        else:
-            print(f"错误: 生成的 assets.bin 不存在: {image_file}")
+        tmp_output = output_path + '.tmp'
+        if not pack_assets_simple(assets_dir, include_path, tmp_output, "assets", 32):
             return False
-            
+
+        os.replace(tmp_output, output_path)
+        with open(stamp_path, 'w', encoding='utf-8') as f:
+            f.write(build_stamp)
+        print(f"成功生成 assets.bin: {output_path}")
+
+        # 显示大小信息
+        total_size = os.path.getsize(output_path)
+        print(f"Assets 文件大小: {total_size / 1024:.2f} KB ({total_size} 字节)")
+
+        return True
+
+
     except Exception as e:
         print(f"错误: 构建 assets 失败: {e}")
         import traceback
@@ -610,6 +684,8 @@ def main():
                        help='英文唤醒词（可选，仅用于 multinet 模型）')
     parser.add_argument('--threshold', type=float, default=0.2,
                        help='Multinet 检测阈值 (0.0-1.0，默认 0.2)')
+    parser.add_argument('--pretty_index', action='store_true',
+                       help='以缩进格式输出 index.json（调试用，默认紧凑格式）')
     
     args = parser.parse_args()
     
@@ -632,7 +708,8 @@ def main():
         output_path=args.output,
         cn_wake_word=args.cn_wake_word,
         en_wake_word=args.en_wake_word,
-        threshold=args.threshold
+        threshold=args.threshold,
+        pretty_index=args.pretty_index
     )
     
     if not success:
@@ -5,12 +5,17 @@
 使用 clang-tidy 和 clang-format 检查代码
 """
 
+import argparse
+import functools
+import hashlib
+import json
 import os
 import sys
 import subprocess
 import shutil
 import tempfile
 import difflib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
 # ANSI 颜色代码 (Windows 10+ 支持)
@@ -29,8 +34,9 @@ if sys.platform == 'win32':
         pass  # 如果失败，继续执行（可能不支持颜色）
 
 
+@functools.lru_cache(maxsize=None)
 def find_tool(tool_name):
-    """查找工具可执行文件"""
+    """查找工具可执行文件（同一工具只探测一次文件系统）"""
     # 1. 首先检查 PATH 环境变量
     tool_path = shutil.which(tool_name)
     if tool_path:
@@ -57,27 +63,40 @@ def find_tool(tool_name):
         if path.exists() and path.is_file():
             return str(path)
     
-    # 4. 尝试检查所有驱动器的常见位置
-    for drive in ['C:', 'D:', 'E:', 'F:']:
-        llvm_path = Path(drive) / 'Software' / 'LLVM' / 'bin' / tool_exe
-        if llvm_path.exists():
-            return str(llvm_path)
-    
+    # 4. 尝试检查所有驱动器的常见位置（仅 Windows 有盘符）
+    if sys.platform == 'win32':
+        for drive in ['C:', 'D:', 'E:', 'F:']:
+            llvm_path = Path(drive) / 'Software' / 'LLVM' / 'bin' / tool_exe
+            if llvm_path.exists():
+                return str(llvm_path)
+
     return None
 
 
-def check_tool(tool_name, install_hint):
-    """检查工具是否安装并返回路径"""
-    tool_path = find_tool(tool_name)
-    if not tool_path:
-        print(f"{RED}错误: {tool_name} 未找到{NC}")
-        print(f"请执行以下操作之一:")
-        print(f"  1. 将 LLVM bin 目录添加到系统 PATH 环境变量")
-        print(f"  2. 设置环境变量 {tool_name.upper().replace('-', '_')}_PATH 指向 {tool_name}.exe")
-        print(f"  3. 从 LLVM 官网下载并安装到默认位置")
-        sys.exit(1)
-    
-    # 验证工具可用
+# 工具 --version 探测结果缓存（跨运行共享）
+VERSION_CACHE_PATH = Path.home() / '.cache' / 'emotipet-check' / 'tool-versions.json'
+
+
+def get_tool_version(tool_path):
+    """获取工具版本信息首行，按 (路径, 修改时间) 缓存到用户目录
+
+    命中缓存时不启动子进程；探测失败返回 None
+    """
+    try:
+        key = f"{tool_path}:{os.path.getmtime(tool_path)}"
+    except OSError:
+        key = None
+
+    cache = {}
+    if key:
+        try:
+            with open(VERSION_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if key in cache:
+                return cache[key]
+        except (OSError, ValueError):
+            cache = {}
+
     try:
         result = subprocess.run(
             [tool_path, '--version'],
@@ -87,94 +106,328 @@ def check_tool(tool_name, install_hint):
             errors='ignore',
             timeout=5
         )
-        if result.returncode != 0:
-            print(f"{YELLOW}警告: {tool_name} 无法执行{NC}")
+        if result.returncode != 0 or not result.stdout:
+            return None
+        version_line = result.stdout.split('\n')[0].strip()
     except Exception:
-        pass  # 忽略验证错误，继续使用
+        return None
+
+    if key:
+        cache[key] = version_line
+        try:
+            VERSION_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = str(VERSION_CACHE_PATH) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp_path, VERSION_CACHE_PATH)
+        except OSError:
+            pass
+    return version_line
+
+
+def check_tool(tool_name, install_hint):
+    """检查工具是否安装并返回路径"""
+    tool_path = find_tool(tool_name)
+    if not tool_path:
+        print(f"{RED}错误: {tool_name} 未找到{NC}")
+        print(f"请执行以下操作之一:")
+        print(f"  1. 将 LLVM bin 目录添加到系统 PATH 环境变量")
+        print(f"  2. 设置环境变量 {tool_name.upper().replace('-', '_')}_PATH 指向 {tool_name}.exe")
+        print(f"  3. 从 LLVM 官网下载并安装到默认位置")
+        sys.exit(1)
     
+    # 验证工具可用（结果缓存，后续展示版本时不再启动子进程）
+    if get_tool_version(tool_path) is None:
+        print(f"{YELLOW}警告: {tool_name} 无法执行{NC}")
+
     return tool_path
 
 
 def find_cpp_files(project_root):
-    """查找所有 C++ 源文件"""
+    """查找所有 C++ 源文件（单次遍历，不进入排除目录）"""
     cpp_extensions = {'.cc', '.cpp', '.hpp', '.h'}
     files = []
-    
+
     main_dir = project_root / 'main'
     if not main_dir.exists():
         return files
-    
-    for ext in cpp_extensions:
-        for file_path in main_dir.rglob(f'*{ext}'):
-            # 排除 build 和 managed_components 目录
-            parts = file_path.parts
-            if 'build' not in parts and 'managed_components' not in parts:
-                files.append(file_path)
-    
+
+    for dirpath, dirnames, filenames in os.walk(main_dir):
+        # 排除 build 和 managed_components 目录（不再向下递归）
+        dirnames[:] = [d for d in dirnames
+                       if d not in ('build', 'managed_components')]
+        dir_path = Path(dirpath)
+        for name in filenames:
+            if os.path.splitext(name)[1] in cpp_extensions:
+                files.append(dir_path / name)
+
     return sorted(files)
 
 
-def check_format(file_path, project_root, clang_format_path):
-    """使用 clang-format 检查代码格式"""
+def parse_tidy_checks(project_root):
+    """从 .clang-tidy 解析 Checks 列表
+
+    支持单行值和 YAML 折叠块（Checks: > 后跟缩进行，本仓库的写法）。
+    解析失败返回 None
+    """
+    config_path = project_root / '.clang-tidy'
+    try:
+        lines = config_path.read_text(encoding='utf-8').splitlines()
+    except OSError:
+        return None
+
+    value_parts = []
+    in_block = False
+    for line in lines:
+        stripped = line.strip()
+        if in_block:
+            # 折叠块由缩进行组成，遇到顶格内容或空行结束
+            if line.startswith((' ', '\t')) and stripped:
+                value_parts.append(stripped)
+                continue
+            break
+        if stripped.startswith('Checks:'):
+            value = stripped[len('Checks:'):].strip()
+            if value in ('>', '|', '>-', '|-'):
+                in_block = True
+            else:
+                value_parts.append(value.strip("'\""))
+                break
+
+    checks = [c.strip() for part in value_parts
+              for c in part.split(',') if c.strip()]
+    return checks or None
+
+
+def shard_tidy_checks(checks, shard_count):
+    """把检查项拆成 shard_count 组
+
+    只轮转分配启用项；排除项（- 前缀）对每组都保留，
+    保证各组内的屏蔽语义与完整配置一致
+    """
+    positives = [c for c in checks if not c.startswith('-')]
+    negatives = [c for c in checks if c.startswith('-')]
+    if len(positives) < shard_count:
+        return None
+    return [positives[i::shard_count] + negatives
+            for i in range(shard_count)]
+
+
+def find_changed_files(project_root, base_ref):
+    """查找相对 base_ref 有变更的 C++ 源文件（git diff）
+
+    main/app/<模块> 内任一文件变更时，整个模块目录都纳入检查，
+    以覆盖模块内部的头文件依赖。失败时返回 None，由调用方回退全量扫描。
+    """
+    cpp_extensions = {'.cc', '.cpp', '.hpp', '.h'}
     try:
-        # 运行 clang-format 获取格式化后的内容
         result = subprocess.run(
-            [clang_format_path, str(file_path)],
+            ['git', 'diff', '--name-only', '-z', '--diff-filter=ACMR',
+             f'{base_ref}...HEAD', '--', 'main'],
             capture_output=True,
             text=True,
             encoding='utf-8',
             errors='ignore',
             cwd=project_root
         )
-        
+    except Exception as e:
+        print(f"{YELLOW}警告: git diff 执行失败: {e}{NC}")
+        return None
+    if result.returncode != 0:
+        print(f"{YELLOW}警告: git diff 失败，回退为全量检查{NC}")
+        return None
+
+    files = set()
+    module_dirs = set()
+    for rel in result.stdout.split('\0'):
+        if not rel:
+            continue
+        parts = Path(rel).parts
+        if 'build' in parts or 'managed_components' in parts:
+            continue
+        # main/app/<模块>/ 下有变更时，整个模块目录纳入检查
+        if len(parts) > 3 and parts[0] == 'main' and parts[1] == 'app':
+            module_dirs.add(project_root / parts[0] / parts[1] / parts[2])
+        file_path = project_root / rel
+        if file_path.suffix in cpp_extensions and file_path.exists():
+            files.add(file_path)
+
+    for module_dir in module_dirs:
+        if not module_dir.is_dir():
+            continue
+        for ext in cpp_extensions:
+            for file_path in module_dir.rglob(f'*{ext}'):
+                files.add(file_path)
+
+    return sorted(files)
+
+
+# 增量检查缓存文件名（位于项目根目录）
+CACHE_FILE_NAME = '.clang-check-cache.json'
+
+# 每次 clang-tidy 调用检查的翻译单元数
+TIDY_BATCH_SIZE = 8
+
+# 每次 clang-format --dry-run 筛查的文件数
+FORMAT_BATCH_SIZE = 16
+
+
+def hash_file(file_path):
+    """计算文件内容的 SHA-256，用于增量检查缓存"""
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def compute_config_hash(project_root, clang_format_path, clang_tidy_path):
+    """计算检查配置的哈希（配置文件内容 + 工具标识）
+
+    配置文件或工具发生变化时整个缓存失效
+    """
+    h = hashlib.sha256()
+    for config_name in ('.clang-format', '.clang-tidy'):
+        config_path = project_root / config_name
+        if config_path.exists():
+            h.update(config_path.read_bytes())
+    # 工具用 路径+修改时间 标识，避免启动时额外运行 --version
+    for tool_path in (clang_format_path, clang_tidy_path):
+        h.update(str(tool_path).encode('utf-8'))
+        try:
+            h.update(str(os.path.getmtime(tool_path)).encode('utf-8'))
+        except OSError:
+            pass
+    return h.hexdigest()
+
+
+def load_check_cache(cache_path, config_hash):
+    """加载检查缓存；配置哈希不匹配时返回空缓存"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('config') == config_hash:
+            return cache.get('files', {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def save_check_cache(cache_path, config_hash, files):
+    """原子写回检查缓存"""
+    tmp_path = str(cache_path) + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'config': config_hash, 'files': files}, f, indent=2)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"{YELLOW}警告: 无法写入检查缓存: {e}{NC}")
+
+
+def check_format_batch(file_paths, project_root, clang_format_path):
+    """使用 clang-format --dry-run 批量筛查格式问题（可在子进程中执行）
+
+    一次调用传入一批文件，摊薄进程启动开销。返回有格式违规的文件
+    路径集合，由调用方仅对这些文件重跑 check_format 生成差异；
+    不支持 --dry-run 的旧版本返回 None，调用方回退逐文件检查
+    """
+    try:
+        result = subprocess.run(
+            [clang_format_path, '--dry-run'] + [str(p) for p in file_paths],
+            capture_output=True,
+            cwd=project_root
+        )
+    except Exception:
+        return None
+
+    # 输出保持字节处理，只做子串匹配，不整体解码
+    stderr = result.stderr or b''
+    if result.returncode != 0 and b'dry-run' in stderr and b'unknown' in stderr.lower():
+        return None
+
+    path_pairs = [(str(p), str(p).encode('utf-8')) for p in file_paths]
+    bad_files = set()
+    for line in stderr.splitlines():
+        for path_str, path_bytes in path_pairs:
+            if path_bytes in line:
+                bad_files.add(path_str)
+                break
+    return bad_files
+
+
+def check_format(file_path, project_root, clang_format_path):
+    """使用 clang-format 检查代码格式（可在子进程中执行）
+
+    文件内容只从磁盘读一次，经 stdin 交给 clang-format，
+    与格式化输出做字节比较；仅在需要展示差异时才解码。
+    返回 (是否有问题, 待输出的文本)，由调用方统一打印
+    """
+    output = []
+    try:
+        try:
+            with open(file_path, 'rb') as f:
+                source = f.read()
+        except OSError as e:
+            output.append(f"{YELLOW}警告: 无法读取文件 {file_path}: {e}{NC}\n")
+            return False, ''.join(output)
+
+        # --assume-filename 保证样式发现和语言识别与按文件名调用一致
+        result = subprocess.run(
+            [clang_format_path, f'--assume-filename={file_path}'],
+            input=source,
+            capture_output=True,
+            cwd=project_root
+        )
+
         if result.returncode != 0:
-            print(f"{RED}格式检查失败: {file_path}{NC}")
-            return True  # 返回 True 表示有问题
-        
-        # 检查输出是否为空
-        if result.stdout is None:
-            print(f"{YELLOW}警告: clang-format 输出为空: {file_path}{NC}")
-            return False  # 不视为格式问题
-        
-        # 读取原文件内容
+            output.append(f"{RED}格式检查失败: {file_path}{NC}\n")
+            return True, ''.join(output)  # True 表示有问题
+
+        if not result.stdout:
+            output.append(f"{YELLOW}警告: clang-format 输出为空: {file_path}{NC}\n")
+            return False, ''.join(output)  # 不视为格式问题
+
+        # 字节级比较，一致时不做任何解码
+        if source == result.stdout:
+            return False, ''.join(output)  # False 表示没有问题
+
+        output.append(f"{RED}格式问题: {file_path}{NC}\n")
+        # 显示差异（最多20行）
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                original_content = f.read()
+            diff = list(difflib.diff_bytes(
+                difflib.unified_diff,
+                source.splitlines(keepends=True),
+                result.stdout.splitlines(keepends=True),
+                fromfile=str(file_path).encode('utf-8'),
+                tofile='格式化后'.encode('utf-8'),
+                n=3
+            ))
+            output.extend(line.decode('utf-8', 'ignore') for line in diff[:20])
         except Exception as e:
-            print(f"{YELLOW}警告: 无法读取文件 {file_path}: {e}{NC}")
-            return False
-        
-        formatted_content = result.stdout
-        
-        # 比较内容
-        if original_content != formatted_content:
-            print(f"{RED}格式问题: {file_path}{NC}")
-            # 显示差异（最多20行）
-            try:
-                diff = list(difflib.unified_diff(
-                    original_content.splitlines(keepends=True),
-                    formatted_content.splitlines(keepends=True),
-                    fromfile=str(file_path),
-                    tofile='格式化后',
-                    n=3
-                ))
-                for line in diff[:20]:
-                    print(line, end='')
-            except Exception as e:
-                print(f"{YELLOW}无法显示差异: {e}{NC}")
-            return True  # 返回 True 表示有问题
-        
-        return False  # 返回 False 表示没有问题
-        
+            output.append(f"{YELLOW}无法显示差异: {e}{NC}\n")
+        return True, ''.join(output)  # True 表示有问题
+
     except Exception as e:
-        print(f"{RED}格式检查失败: {file_path} - {e}{NC}")
-        return True
+        output.append(f"{RED}格式检查失败: {file_path} - {e}{NC}\n")
+        return True, ''.join(output)
 
 
-def check_tidy(file_path, project_root, clang_tidy_path, compile_db_path=None):
-    """使用 clang-tidy 检查代码质量"""
+def check_tidy(file_paths, project_root, clang_tidy_path, compile_db_path=None,
+               checks=None):
+    """使用 clang-tidy 批量检查代码质量（可在子进程中执行）
+
+    一次调用传入一批翻译单元，摊薄进程启动和头文件解析的开销。
+    checks 非空时用 --checks 覆盖配置文件的检查列表（分片模式）。
+    返回 (有问题的文件路径集合, 待输出的文本)，由调用方统一打印
+    """
     try:
-        cmd = [clang_tidy_path, str(file_path)]
+        project_root = Path(project_root)
+        compile_db_path = Path(compile_db_path) if compile_db_path else None
+        cmd = [clang_tidy_path] + [str(p) for p in file_paths]
+
+        # 分片模式：只跑本组检查项（命令行优先于配置文件的 Checks）
+        if checks:
+            cmd.extend(['--checks', '-*,' + ','.join(checks)])
         
         # 添加配置文件
         clang_tidy_config = project_root / '.clang-tidy'
@@ -198,51 +451,78 @@ def check_tidy(file_path, project_root, clang_tidy_path, compile_db_path=None):
         result = subprocess.run(
             cmd,
             capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore',
             cwd=project_root
         )
-        
+
         # 过滤输出，只保留 main 目录下的警告和错误
+        # 输出保持字节处理，只有最终展示的行才解码
         output_lines = []
         if result.stderr:
             output_lines.extend(result.stderr.splitlines())
         if result.stdout:
             output_lines.extend(result.stdout.splitlines())
-        
+
         main_issues = []
-        
+
         exclude_patterns = [
-            'clang-diagnostic-error',
-            'unknown argument',
-            'not supported',
-            '/esp-idf/',
-            '/managed_components/',
-            'expanded from macro'
+            b'clang-diagnostic-error',
+            b'unknown argument',
+            b'not supported',
+            b'/esp-idf/',
+            b'/managed_components/',
+            b'expanded from macro'
         ]
-        
+
         for line in output_lines:
-            if 'warning:' in line or 'error:' in line:
-                if 'main/' in line:
+            if b'warning:' in line or b'error:' in line:
+                if b'main/' in line:
                     # 检查是否包含排除模式
                     if not any(pattern in line for pattern in exclude_patterns):
                         main_issues.append(line)
-        
+
         if main_issues:
-            for issue in main_issues:
-                print(issue)
-            return True  # 返回 True 表示有问题
-        
-        return False  # 返回 False 表示没有问题
-        
+            # 按 路径:行:列 前缀把问题归属到批内文件
+            path_pairs = [(str(p), str(p).encode('utf-8')) for p in file_paths]
+            bad_files = set()
+            for line in main_issues:
+                for path_str, path_bytes in path_pairs:
+                    if path_bytes in line:
+                        bad_files.add(path_str)
+                        break
+            if not bad_files:
+                # 无法归属的问题保守地算到整批文件头上，避免缓存误跳过
+                bad_files = {str(p) for p in file_paths}
+            text = '\n'.join(line.decode('utf-8', 'ignore')
+                             for line in main_issues) + '\n'
+            return bad_files, text
+
+        return set(), ''  # 空集合表示没有问题
+
     except Exception as e:
-        print(f"{RED}代码质量检查失败: {file_path} - {e}{NC}")
-        return False  # 检查失败不算问题，避免误报
+        # 检查失败不算问题，避免误报
+        files_str = ', '.join(str(p) for p in file_paths)
+        return set(), f"{RED}代码质量检查失败: {files_str} - {e}{NC}\n"
 
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='C++ 代码检查工具 (clang-format + clang-tidy)')
+    parser.add_argument(
+        '--changed',
+        nargs='?',
+        const='master',
+        metavar='BASE_REF',
+        help='仅检查相对 BASE_REF 有变更的文件（默认: master）'
+    )
+    parser.add_argument(
+        '--shard-checks',
+        type=int,
+        default=1,
+        metavar='K',
+        help='把 .clang-tidy 的检查项拆成 K 组并行执行（默认: 1 不拆分）'
+    )
+    args = parser.parse_args()
+
     # 获取项目根目录
     script_dir = Path(__file__).parent
     project_root = script_dir.parent
@@ -254,66 +534,56 @@ def main():
     clang_tidy_path = check_tool('clang-tidy', '请安装 clang-tidy')
     clang_format_path = check_tool('clang-format', '请安装 clang-format')
     
-    # 显示工具版本信息
-    try:
-        result = subprocess.run(
-            [clang_tidy_path, '--version'],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore',
-            timeout=5
-        )
-        if result.returncode == 0 and result.stdout:
-            version_line = result.stdout.split('\n')[0]
-            print(f"找到 clang-tidy: {version_line}")
-            print(f"路径: {clang_tidy_path}")
-    except Exception:
-        pass
-    
-    try:
-        result = subprocess.run(
-            [clang_format_path, '--version'],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore',
-            timeout=5
-        )
-        if result.returncode == 0 and result.stdout:
-            version_line = result.stdout.split('\n')[0]
-            print(f"找到 clang-format: {version_line}")
-            print(f"路径: {clang_format_path}\n")
-    except Exception:
-        pass
-    
+    # 显示工具版本信息（check_tool 已探测并缓存，这里直接命中缓存）
+    for tool_name, tool_path in (('clang-tidy', clang_tidy_path),
+                                 ('clang-format', clang_format_path)):
+        version_line = get_tool_version(tool_path)
+        if version_line:
+            print(f"找到 {tool_name}: {version_line}")
+            print(f"路径: {tool_path}")
+
     print("")
     
-    # 查找所有 C++ 源文件
-    files_to_check = find_cpp_files(project_root)
-    
-    if not files_to_check:
+    # 查找需要检查的 C++ 源文件
+    all_files = None
+    if args.changed:
+        all_files = find_changed_files(project_root, args.changed)
+        if all_files is not None:
+            print(f"增量模式: 相对 {args.changed} 变更 {len(all_files)} 个文件")
+            if not all_files:
+                print(f"{GREEN}没有变更的 C++ 源文件，无需检查{NC}")
+                sys.exit(0)
+    if all_files is None:
+        all_files = find_cpp_files(project_root)
+
+    if not all_files:
         print(f"{YELLOW}警告: 未找到 C++ 源文件{NC}")
         sys.exit(1)
-    
-    # 1. 使用 clang-format 检查代码格式
-    print(f"{YELLOW}[1/2] 检查代码格式 (clang-format)...{NC}")
-    format_issues = 0
-    
-    for file_path in files_to_check:
-        if file_path.exists():
-            if check_format(file_path, project_root, clang_format_path):
-                format_issues += 1
-    
-    if format_issues == 0:
-        print(f"{GREEN}代码格式检查通过{NC}\n")
-    else:
-        print(f"{RED}✗ 发现 {format_issues} 个格式问题{NC}\n")
-    
-    # 2. 使用 clang-tidy 检查代码质量
-    print(f"{YELLOW}[2/2] 检查代码质量 (clang-tidy)...{NC}")
-    
-    # 查找编译数据库
+
+    # 增量检查：内容和配置都没变的文件直接跳过
+    cache_path = project_root / CACHE_FILE_NAME
+    config_hash = compute_config_hash(project_root, clang_format_path, clang_tidy_path)
+    cached_files = load_check_cache(cache_path, config_hash)
+    file_hashes = {}
+    files_to_check = []
+    for p in all_files:
+        rel = p.relative_to(project_root).as_posix()
+        try:
+            file_hashes[rel] = hash_file(p)
+        except OSError:
+            continue
+        if cached_files.get(rel) != file_hashes[rel]:
+            files_to_check.append(p)
+
+    skipped = len(all_files) - len(files_to_check)
+    if skipped:
+        print(f"跳过 {skipped} 个未变更文件 (缓存: {CACHE_FILE_NAME})")
+    if not files_to_check:
+        print(f"{GREEN}=== 检查完成 ==={NC}")
+        print(f"{GREEN}所有文件均未变更，所有检查通过！{NC}")
+        sys.exit(0)
+
+    # 查找编译数据库（提前到并行检查之前，交互提示不打断流水线）
     compile_db_path = None
     if (project_root / 'build' / 'compile_commands.json').exists():
         compile_db_path = project_root / 'build' / 'compile_commands.json'
@@ -331,19 +601,124 @@ def main():
         reply = input("是否继续使用基本检查? (y/n) ")
         if reply.lower() != 'y':
             sys.exit(1)
-    
+
+    # 有问题的文件不写入缓存，下次仍会重新检查
+    bad_files = set()
+    format_issues = 0
     tidy_issues = 0
-    for file_path in files_to_check:
-        if file_path.exists():
-            print(f"检查: {file_path}")
-            if check_tidy(file_path, project_root, clang_tidy_path, compile_db_path):
-                tidy_issues += 1
-    
+
+    # format 批量筛查与 tidy 批次同时提交到一个进程池，
+    # 两个阶段重叠执行，总耗时趋近 max(format, tidy) 而非两者之和
+    print(f"{YELLOW}检查代码格式与代码质量 (clang-format + clang-tidy)...{NC}")
+
+    format_batches = [files_to_check[i:i + FORMAT_BATCH_SIZE]
+                      for i in range(0, len(files_to_check), FORMAT_BATCH_SIZE)]
+    tidy_batches = [files_to_check[i:i + TIDY_BATCH_SIZE]
+                    for i in range(0, len(files_to_check), TIDY_BATCH_SIZE)]
+    batch_worker = functools.partial(
+        check_format_batch,
+        project_root=str(project_root),
+        clang_format_path=clang_format_path
+    )
+    format_worker = functools.partial(
+        check_format,
+        project_root=str(project_root),
+        clang_format_path=clang_format_path
+    )
+    tidy_worker = functools.partial(
+        check_tidy,
+        project_root=str(project_root),
+        clang_tidy_path=clang_tidy_path,
+        compile_db_path=str(compile_db_path) if compile_db_path else None
+    )
+
+    # --shard-checks: 把检查项拆成 K 组，同一批文件由 K 个进程分担
+    shard_count = max(1, args.shard_checks)
+    check_shards = None
+    if shard_count > 1:
+        all_checks = parse_tidy_checks(project_root)
+        check_shards = (shard_tidy_checks(all_checks, shard_count)
+                        if all_checks else None)
+        if not check_shards:
+            print(f"{YELLOW}警告: 无法把 .clang-tidy 检查项拆成 {shard_count} 组，"
+                  f"忽略 --shard-checks{NC}")
+            shard_count = 1
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        futures = {}
+        for batch in format_batches:
+            future = pool.submit(batch_worker, [str(p) for p in batch])
+            futures[future] = ('format_batch', batch)
+        # 每个 tidy 批次聚合全部分片结果后再统一打印、去重
+        tidy_pending = {}
+        for batch_idx, batch in enumerate(tidy_batches):
+            tidy_pending[batch_idx] = {'left': shard_count,
+                                       'bad': set(), 'lines': []}
+            for shard_idx in range(shard_count):
+                shard = check_shards[shard_idx] if check_shards else None
+                future = pool.submit(tidy_worker, [str(p) for p in batch],
+                                     checks=shard)
+                futures[future] = ('tidy', (batch_idx, batch))
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, payload = futures.pop(future)
+                if kind == 'format_batch':
+                    # 筛查出的可疑文件立刻追加完整格式检查任务
+                    batch_bad = future.result()
+                    if batch_bad is None:
+                        # 旧版 clang-format 不支持 --dry-run，整批逐文件检查
+                        batch_bad = {str(p) for p in payload}
+                    for p in payload:
+                        if str(p) in batch_bad:
+                            follow_up = pool.submit(format_worker, str(p))
+                            futures[follow_up] = ('format', p)
+                            pending.add(follow_up)
+                elif kind == 'format':
+                    has_issue, output = future.result()
+                    if output:
+                        print(output, end='')
+                    if has_issue:
+                        format_issues += 1
+                        bad_files.add(payload)
+                else:  # tidy
+                    batch_idx, batch = payload
+                    batch_bad, output = future.result()
+                    state = tidy_pending[batch_idx]
+                    state['left'] -= 1
+                    state['bad'].update(batch_bad)
+                    if output:
+                        state['lines'].extend(output.splitlines())
+                    if state['left'] > 0:
+                        continue
+                    for p in batch:
+                        print(f"检查: {p}")
+                    # 跨分片去重（同一诊断可能被多组检查命中）
+                    for line in dict.fromkeys(state['lines']):
+                        print(line)
+                    tidy_issues += len(state['bad'])
+                    for p in batch:
+                        if str(p) in state['bad']:
+                            bad_files.add(p)
+
+    if format_issues == 0:
+        print(f"{GREEN}代码格式检查通过{NC}")
+    else:
+        print(f"{RED}✗ 发现 {format_issues} 个格式问题{NC}")
     if tidy_issues == 0:
         print(f"{GREEN}代码质量检查通过{NC}\n")
     else:
         print(f"{RED}✗ 发现 {tidy_issues} 个文件有代码质量问题{NC}\n")
     
+    # 通过全部检查的文件写入缓存，下次内容不变即可跳过
+    for p in files_to_check:
+        rel = p.relative_to(project_root).as_posix()
+        if p not in bad_files and rel in file_hashes:
+            cached_files[rel] = file_hashes[rel]
+    save_check_cache(cache_path, config_hash, cached_files)
+
     # 总结
     print(f"{GREEN}=== 检查完成 ==={NC}")
     total_issues = format_issues + tidy_issues
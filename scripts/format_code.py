@@ -9,6 +9,7 @@ import os
 import sys
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # ANSI 颜色代码 (Windows 10+ 支持)
@@ -62,21 +63,23 @@ def find_clang_format():
 
 
 def find_cpp_files(project_root):
-    """查找所有 C++ 源文件"""
+    """查找所有 C++ 源文件（单次遍历，不进入排除目录）"""
     cpp_extensions = {'.cc', '.cpp', '.hpp', '.h'}
     files = []
-    
+
     main_dir = project_root / 'main'
     if not main_dir.exists():
         return files
-    
-    for ext in cpp_extensions:
-        for file_path in main_dir.rglob(f'*{ext}'):
-            # 排除 build 和 managed_components 目录
-            parts = file_path.parts
-            if 'build' not in parts and 'managed_components' not in parts:
-                files.append(file_path)
-    
+
+    for dirpath, dirnames, filenames in os.walk(main_dir):
+        # 排除 build 和 managed_components 目录（不再向下递归）
+        dirnames[:] = [d for d in dirnames
+                       if d not in ('build', 'managed_components')]
+        dir_path = Path(dirpath)
+        for name in filenames:
+            if os.path.splitext(name)[1] in cpp_extensions:
+                files.append(dir_path / name)
+
     return sorted(files)
 
 
@@ -134,22 +137,28 @@ def main():
         print("已取消")
         sys.exit(0)
     
-    # 格式化文件
+    # 格式化文件（每个 clang-format -i 只写自己的文件，用线程池并行）
+    def format_one(file_path):
+        if not file_path.exists():
+            return None
+        try:
+            subprocess.run(
+                [clang_format_path, '-i', str(file_path)],
+                cwd=project_root,
+                check=True
+            )
+            return True
+        except Exception:
+            return False
+
     formatted = 0
-    for file_path in files:
-        if file_path.exists():
-            print(f"格式化: {file_path}")
-            try:
-                result = subprocess.run(
-                    [clang_format_path, '-i', str(file_path)],
-                    cwd=project_root,
-                    check=True
-                )
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        for file_path, ok in zip(files, pool.map(format_one, files)):
+            if ok:
+                print(f"格式化: {file_path}")
                 formatted += 1
-            except subprocess.CalledProcessError as e:
-                print(f"{YELLOW}警告: 格式化失败 {file_path} - {e}{NC}")
-            except Exception as e:
-                print(f"{YELLOW}警告: 格式化失败 {file_path} - {e}{NC}")
+            elif ok is False:
+                print(f"{YELLOW}警告: 格式化失败 {file_path}{NC}")
     
     print("")
     print(f"{GREEN}已格式化 {formatted} 个文件{NC}")
@@ -58,6 +58,21 @@ class ProvisionCommand:
     GET_IP       = 0x11
 
 
+# 状态码到描述的映射（模块级常量，通知回调热路径中直接查表）
+_STATUS_STRINGS = {
+    0x00: "空闲",
+    0x01: "连接中",
+    0x02: "已连接",
+    0x10: "连接超时",
+    0x11: "密码错误",
+    0x12: "网络未找到",
+    0x1F: "未知错误",
+}
+
+# 配网流程的终态（成功或各种失败）
+_FINAL_STATES = frozenset({0x02, 0x10, 0x11, 0x12, 0x1F})
+
+
 class ProvisionStatus:
     IDLE             = 0x00
     CONNECTING       = 0x01
@@ -69,16 +84,8 @@ class ProvisionStatus:
 
     @staticmethod
     def to_string(status: int) -> str:
-        status_map = {
-            0x00: "空闲",
-            0x01: "连接中",
-            0x02: "已连接",
-            0x10: "连接超时",
-            0x11: "密码错误",
-            0x12: "网络未找到",
-            0x1F: "未知错误",
-        }
-        return status_map.get(status, f"未知状态 ({status:#04x})")
+        result = _STATUS_STRINGS.get(status)
+        return result if result is not None else f"未知状态 ({status:#04x})"
 
 
 # ==================== BLE WiFi 配置器 ====================
@@ -90,19 +97,22 @@ class BLEWiFiConfigurator:
         self.status_callback = None
 
     async def scan_devices(self, timeout: float = 5.0, name_filter: str = "EmotiPet") -> list:
-        """扫描 BLE 设备"""
+        """扫描 BLE 设备
+
+        指定名称过滤时收到第一条匹配广播立即返回，不等完整超时；
+        不过滤时做完整扫描，列出所有设备
+        """
         print(f"正在扫描 BLE 设备 ({timeout} 秒)...")
-        
+
+        if name_filter:
+            device = await BleakScanner.find_device_by_filter(
+                lambda d, ad: bool(d.name) and name_filter.lower() in d.name.lower(),
+                timeout=timeout
+            )
+            return [device] if device else []
+
         devices = await BleakScanner.discover(timeout=timeout)
-        filtered = []
-        
-        for device in devices:
-            if name_filter and device.name and name_filter.lower() in device.name.lower():
-                filtered.append(device)
-            elif not name_filter:
-                filtered.append(device)
-        
-        return filtered
+        return list(devices)
 
     async def connect(self, device: BLEDevice) -> bool:
         """连接到设备"""
@@ -126,40 +136,38 @@ class BLEWiFiConfigurator:
         self.client = None
         self.device = None
 
+    async def _safe_read(self, char_uuid: str) -> Optional[bytearray]:
+        """读取特征值，失败时返回 None"""
+        try:
+            return await self.client.read_gatt_char(char_uuid)
+        except:
+            return None
+
     async def read_device_info(self) -> dict:
         """读取设备信息"""
         if not self.client or not self.client.is_connected:
             return {}
-        
+
+        # 四个特征互相独立，并发读取只等一次往返
+        manufacturer, model, firmware, battery = await asyncio.gather(
+            self._safe_read(MANUFACTURER_CHAR_UUID),
+            self._safe_read(MODEL_NUMBER_CHAR_UUID),
+            self._safe_read(FIRMWARE_REV_CHAR_UUID),
+            self._safe_read(BATTERY_LEVEL_CHAR_UUID),
+        )
+
         info = {}
-        try:
-            # 读取制造商
-            data = await self.client.read_gatt_char(MANUFACTURER_CHAR_UUID)
-            info["manufacturer"] = data.decode("utf-8")
-        except:
-            pass
-        
-        try:
-            # 读取型号
-            data = await self.client.read_gatt_char(MODEL_NUMBER_CHAR_UUID)
-            info["model"] = data.decode("utf-8")
-        except:
-            pass
-        
-        try:
-            # 读取固件版本
-            data = await self.client.read_gatt_char(FIRMWARE_REV_CHAR_UUID)
-            info["firmware"] = data.decode("utf-8")
-        except:
-            pass
-        
-        try:
-            # 读取电池电量
-            data = await self.client.read_gatt_char(BATTERY_LEVEL_CHAR_UUID)
-            info["battery"] = data[0]
-        except:
-            pass
-        
+        for key, data in (("manufacturer", manufacturer), ("model", model),
+                          ("firmware", firmware)):
+            if data is None:
+                continue
+            try:
+                info[key] = data.decode("utf-8")
+            except UnicodeDecodeError:
+                pass  # 与读取失败同样处理：丢弃该字段，不中断配网
+        if battery:
+            info["battery"] = battery[0]
+
         return info
 
     async def read_wifi_status(self) -> int:
@@ -200,37 +208,45 @@ class BLEWiFiConfigurator:
             except:
                 pass
 
+    async def _write_fast(self, char_uuid: str, data: bytes) -> None:
+        """写入特征值，优先走 write-without-response
+
+        特征未声明 write-without-response 时回退带响应写
+        """
+        char = None
+        try:
+            char = self.client.services.get_characteristic(char_uuid)
+        except Exception:
+            pass
+
+        if char is not None and "write-without-response" in char.properties:
+            await self.client.write_gatt_char(char_uuid, data, response=False)
+        else:
+            await self.client.write_gatt_char(char_uuid, data, response=True)
+
     async def configure_wifi(self, ssid: str, password: str) -> bool:
         """配置 WiFi"""
         if not self.client or not self.client.is_connected:
             print("未连接到设备")
             return False
-        
+
         try:
-            # 1. 写入 SSID
+            # 1. 写入 SSID（无响应写，不等 ACK 往返）
             print(f"设置 SSID: {ssid}")
-            await self.client.write_gatt_char(
-                WIFI_SSID_CHAR_UUID,
-                ssid.encode("utf-8"),
-                response=True
-            )
-            
-            # 2. 写入密码
+            await self._write_fast(WIFI_SSID_CHAR_UUID, ssid.encode("utf-8"))
+
+            # 2. 写入密码（无响应写，不等 ACK 往返）
             print("设置密码: ********")
-            await self.client.write_gatt_char(
-                WIFI_PASSWORD_CHAR_UUID,
-                password.encode("utf-8"),
-                response=True
-            )
-            
-            # 3. 发送连接命令
+            await self._write_fast(WIFI_PASSWORD_CHAR_UUID, password.encode("utf-8"))
+
+            # 3. 发送连接命令（带响应，作为前两次写入的同步屏障）
             print("发送连接命令...")
             await self.client.write_gatt_char(
                 WIFI_COMMAND_CHAR_UUID,
                 bytes([ProvisionCommand.CONNECT]),
                 response=True
             )
-            
+
             return True
         except Exception as e:
             print(f"配置 WiFi 失败: {e}")
@@ -316,11 +332,7 @@ async def main():
         def on_status_change(new_status):
             print(f"  WiFi 状态更新: {ProvisionStatus.to_string(new_status)}")
             final_status[0] = new_status
-            if new_status in [ProvisionStatus.CONNECTED, 
-                              ProvisionStatus.FAILED_TIMEOUT,
-                              ProvisionStatus.FAILED_WRONG_PWD,
-                              ProvisionStatus.FAILED_NOT_FOUND,
-                              ProvisionStatus.FAILED_UNKNOWN]:
+            if new_status in _FINAL_STATES:
                 status_event.set()
         
         await configurator.subscribe_status(on_status_change)
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gunicorn 生产部署配置
+
+    gunicorn -c gunicorn_conf.py ota_server:app
+
+Flask 自带的开发服务器是单进程单线程的，设备多了之后
+OTA 轮询和固件下载会互相排队；gevent worker 让每个进程
+能同时挂上千个慢速设备连接。
+
+注意：进程内的缓存（文件信息、最新固件描述符、时间戳）
+都是 process-local 的，多 worker 下各自独立预热，语义不变。
+"""
+
+import os
+
+bind = '0.0.0.0:5000'
+workers = (os.cpu_count() or 2) * 2 + 1
+worker_class = 'gevent'
+worker_connections = 1000
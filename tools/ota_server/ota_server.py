@@ -6,20 +6,45 @@ ESP32 OTA 升级服务器
 """
 
 import os
+import re
 import json
+import time
+import functools
 import hashlib
+import tempfile
+import threading
 import zipfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pathlib import Path
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory
+from flask import Flask, render_template, request, send_file, send_from_directory
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = FileSystemEventHandler = None
+
+try:
+    from packaging.version import Version, InvalidVersion
+except ImportError:
+    Version = InvalidVersion = None
+
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 app.config['UPLOAD_FOLDER'] = 'firmware'
 app.config['ALLOWED_EXTENSIONS'] = {'bin', 'bin.gz', 'zip'}
+# 置为 1 时固件下载交给前置 nginx 用 sendfile 直发（见 download_firmware）
+app.config['USE_ACCEL_REDIRECT'] = os.environ.get('OTA_ACCEL_REDIRECT') == '1'
+# 固定部署地址时可直接指定下载 URL 前缀，省去每个请求解析 Host 头
+BASE_URL = os.environ.get('OTA_BASE_URL', '').rstrip('/')
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -28,14 +53,62 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 
 def log_json_message(direction, endpoint, data):
-    """打印JSON消息（请求或响应）"""
+    """打印JSON消息（请求或响应）
+
+    INFO 级别只记一行摘要，完整的缩进 dump 降到 DEBUG，
+    生产日志级别下不再为每个请求构造大字符串
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        summary = data if isinstance(data, dict) else {}
+        logger.info('[%s] %s type=%s from=%s', direction, endpoint,
+                    summary.get('type'), summary.get('from'))
+        return
     try:
-        json_str = json.dumps(data, ensure_ascii=False, indent=2)
-        logger.info(f"[{direction}] {endpoint}\n{json_str}")
+        if orjson is not None:
+            json_str = orjson.dumps(
+                data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+        else:
+            json_str = json.dumps(data, ensure_ascii=False, indent=2)
+        logger.debug(f"[{direction}] {endpoint}\n{json_str}")
     except Exception as e:
         logger.warning(f"无法格式化JSON消息: {e}")
 
 
+def ojson(data, status=200):
+    """JSON 响应，优先用 orjson（C 实现）序列化，未安装时退回标准库"""
+    if orjson is not None:
+        body = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        body = json.dumps(data, ensure_ascii=False)
+    return app.response_class(body, status=status, mimetype='application/json')
+
+
+def ota_error(endpoint, to, code, message, status=400):
+    """构造并记录统一的 OTA 错误响应（消息格式）"""
+    response = {
+        'type': 'error',
+        'from': 'ota_server',
+        'to': to,
+        'timestamp': get_timestamp(),
+        'data': {
+            'code': code,
+            'message': message
+        }
+    }
+    log_json_message('RESPONSE', endpoint, response)
+    return ojson(response, status)
+
+# 文件名中的版本号（如 EmotiPet_v1.0.0.zip、firmware_v1.2.bin）
+_VER_RE = re.compile(r'_v(\d+(?:\.\d+)*)\.(?:bin|zip)', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=256)
+def parse_version_from_name(filename):
+    """从文件名提取版本号，提取不到返回 1.0.0"""
+    m = _VER_RE.search(filename)
+    return m.group(1) if m else "1.0.0"
+
+
 def allowed_file(filename):
     """检查文件扩展名是否允许"""
     return '.' in filename and \
@@ -77,26 +150,44 @@ def extract_bin_from_zip(zip_path, output_dir=None):
                 # 只提取bin文件，不保留目录结构
                 filename = os.path.basename(bin_file)
                 # 如果zip文件名包含版本信息，尝试保留版本信息
-                zip_basename = os.path.splitext(os.path.basename(zip_path))[0]
-                if '_v' in zip_basename:
+                m = _VER_RE.search(os.path.basename(zip_path))
+                if m:
                     # 从zip文件名提取版本，生成新的bin文件名
-                    try:
-                        version = zip_basename.split('_v')[1]
-                        name, ext = os.path.splitext(filename)
-                        filename = f"{name}_v{version}{ext}"
-                    except:
-                        pass
+                    name, ext = os.path.splitext(filename)
+                    filename = f"{name}_v{m.group(1)}{ext}"
                 
                 output_path = os.path.join(output_dir, filename)
-                
-                # 如果文件已存在，添加时间戳避免覆盖
+
+                # 已有的提取结果不比 zip 旧时直接复用，避免每次请求重复解压
+                try:
+                    if os.path.getmtime(output_path) >= os.path.getmtime(zip_path):
+                        return output_path
+                except OSError:
+                    pass
+
+                # 如果文件已存在（且已过期），添加时间戳避免覆盖
                 if os.path.exists(output_path):
                     name, ext = os.path.splitext(filename)
                     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                     output_path = os.path.join(output_dir, f"{name}_{timestamp}{ext}")
                 
+                # 分块流式解压，不把整个 bin 读进内存；
+                # 边写边算 MD5 并填充缓存，提取完不用再整读一遍
+                inner_md5 = hashlib.md5()
                 with zip_ref.open(bin_file) as source, open(output_path, 'wb') as target:
-                    target.write(source.read())
+                    for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                        target.write(chunk)
+                        inner_md5.update(chunk)
+
+                stat = os.stat(output_path)
+                info = {
+                    'name': os.path.basename(output_path),
+                    'size': stat.st_size,
+                    'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                    'md5': inner_md5.hexdigest()
+                }
+                with _INFO_CACHE_LOCK:
+                    _INFO_CACHE[output_path] = (stat.st_mtime_ns, stat.st_size, info)
                 
                 extracted_files.append(output_path)
                 logger.info(f"从zip提取bin文件: {bin_file} -> {output_path}")
@@ -107,34 +198,46 @@ def extract_bin_from_zip(zip_path, output_dir=None):
         return None
 
 
+# 文件信息缓存：filepath -> (mtime_ns, size, info)
+# 固件只在上传/删除时变化，缓存命中时不再重读文件算 MD5
+_INFO_CACHE = {}
+_INFO_CACHE_LOCK = threading.Lock()
+
+
 def get_file_info(filepath):
-    """获取文件信息"""
+    """获取文件信息（按 (mtime, size) 缓存，文件不变时不重算 MD5）"""
     stat = os.stat(filepath)
-    return {
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _INFO_CACHE_LOCK:
+        hit = _INFO_CACHE.get(filepath)
+        if hit and hit[:2] == key:
+            return hit[2]
+
+    info = {
         'name': os.path.basename(filepath),
         'size': stat.st_size,
         'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
         'md5': calculate_md5(filepath)
     }
+    with _INFO_CACHE_LOCK:
+        _INFO_CACHE[filepath] = (key[0], key[1], info)
+    return info
+
+
+def invalidate_file_info(filepath):
+    """文件上传/删除后清除对应的缓存条目"""
+    with _INFO_CACHE_LOCK:
+        _INFO_CACHE.pop(filepath, None)
 
 
 def get_file_info_with_version(filepath, version=None):
     """获取文件信息（包含版本号）"""
-    info = get_file_info(filepath)
+    # 复制缓存条目，附加字段不写回缓存
+    info = dict(get_file_info(filepath))
     # 如果没有提供版本号，尝试从文件名提取（格式：firmware_v1.0.0.bin 或 EmotiPet_v1.0.0.zip）
+    filename = info['name']
     if version is None:
-        filename = info['name']
-        if '_v' in filename:
-            try:
-                # 支持 .bin 和 .zip 格式
-                if filename.endswith('.zip'):
-                    version = filename.split('_v')[1].split('.zip')[0]
-                else:
-                    version = filename.split('_v')[1].split('.bin')[0]
-            except:
-                version = "1.0.0"
-        else:
-            version = "1.0.0"
+        version = parse_version_from_name(filename)
     
     info['version'] = version
     info['info'] = f"固件版本 {version}"
@@ -143,37 +246,175 @@ def get_file_info_with_version(filepath, version=None):
     return info
 
 
+def _iter_firmware():
+    """单次 scandir 遍历固件目录，产出 bin/zip 文件的 DirEntry
+
+    DirEntry.stat() 的结果自带缓存，调用方复用同一次 stat
+    """
+    try:
+        entries = os.scandir(app.config['UPLOAD_FOLDER'])
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if entry.name.endswith('.zip') or '.bin' in entry.name:
+                yield entry
+
+
 def get_latest_firmware():
     """获取最新的固件文件"""
-    firmware_dir = Path(app.config['UPLOAD_FOLDER'])
-    files = []
-    
-    # 查找所有bin和zip文件
-    for pattern in ['*.bin*', '*.zip']:
-        for file_path in firmware_dir.glob(pattern):
-            if file_path.is_file():
-                files.append(str(file_path))
-    
-    if not files:
+    latest = max(_iter_firmware(),
+                 key=lambda e: e.stat().st_mtime_ns, default=None)
+    return latest.path if latest else None
+
+
+# 最新固件描述符：上传/删除时后台预计算，设备轮询只读字典
+_LATEST = None
+_LATEST_LOCK = threading.Lock()
+_PRECOMPUTE_POOL = ThreadPoolExecutor(max_workers=1)
+
+
+def _build_latest_descriptor():
+    """计算最新固件的完整描述（文件信息 + zip 预提取）"""
+    latest_file = get_latest_firmware()
+    if not latest_file:
         return None
-    
-    # 按修改时间排序，返回最新的
-    files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-    return files[0]
+
+    descriptor = get_file_info_with_version(latest_file)
+    descriptor['path'] = latest_file
+    if descriptor.get('is_zip', False):
+        descriptor['extracted_path'] = extract_bin_from_zip(latest_file)
+    return descriptor
+
+
+def refresh_latest_firmware():
+    """重新计算并发布最新固件描述符"""
+    global _LATEST
+    try:
+        descriptor = _build_latest_descriptor()
+    except Exception as e:
+        logger.warning(f"预计算最新固件信息失败: {e}")
+        return
+    with _LATEST_LOCK:
+        _LATEST = descriptor
+
+
+def get_latest_descriptor():
+    """读取最新固件描述符，冷启动或文件已消失时同步重算一次"""
+    with _LATEST_LOCK:
+        descriptor = _LATEST
+    if descriptor is None or not os.path.exists(descriptor['path']):
+        refresh_latest_firmware()
+        with _LATEST_LOCK:
+            descriptor = _LATEST
+    return descriptor
+
+
+def _version_tuple(version):
+    """把 '1.10.0' 这类点分版本号转成整数元组，不合法时返回 None"""
+    try:
+        return tuple(int(x) for x in version.split('.'))
+    except ValueError:
+        return None
+
+
+def is_version_newer(latest_version, current_version):
+    """判断 latest 是否比 current 新
+
+    字符串比较会把 1.10.0 判得比 1.9.0 旧，优先用语义化版本比较；
+    packaging 未安装时退回数字元组比较（语义相同，只是不认预发布
+    后缀），两边都解析不了才按字符串比
+    """
+    if Version is not None:
+        try:
+            return Version(latest_version) > Version(current_version)
+        except InvalidVersion:
+            pass
+    latest = _version_tuple(latest_version)
+    current = _version_tuple(current_version)
+    if latest is not None and current is not None:
+        return latest > current
+    return latest_version > current_version
+
+
+# 时间戳只有秒级精度，同一秒内的请求复用已格式化的字符串
+_TS_CACHE = [0, '']
+
+
+# 固件列表缓存：装了 watchdog 时由目录事件失效，列表接口变成纯字典读；
+# 未安装时保持每次请求重扫目录的原行为
+_LIST_CACHE = None
+_LIST_CACHE_LOCK = threading.Lock()
+_WATCHER_ACTIVE = False
+
+
+def invalidate_firmware_list():
+    """固件目录发生变化后丢弃列表缓存"""
+    global _LIST_CACHE
+    with _LIST_CACHE_LOCK:
+        _LIST_CACHE = None
+
+
+def start_firmware_watcher():
+    """用 inotify 事件维护固件目录索引（watchdog 未安装时跳过）"""
+    global _WATCHER_ACTIVE
+    if Observer is None:
+        return
+
+    class _FirmwareDirHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            invalidate_file_info(event.src_path)
+            invalidate_firmware_list()
+            _PRECOMPUTE_POOL.submit(refresh_latest_firmware)
+
+    observer = Observer()
+    observer.daemon = True
+    observer.schedule(_FirmwareDirHandler(), app.config['UPLOAD_FOLDER'],
+                      recursive=False)
+    observer.start()
+    _WATCHER_ACTIVE = True
+    logger.info("固件目录监听已启动，列表接口走事件失效缓存")
 
 
 def get_timestamp():
-    """生成 ISO 8601 格式时间戳"""
-    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+    """生成 ISO 8601 格式时间戳（按秒缓存格式化结果）"""
+    now = int(time.time())
+    cache = _TS_CACHE
+    if cache[0] != now:
+        cache[1] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))
+        cache[0] = now
+    return cache[1]
 
 
 def calculate_md5(filepath):
     """计算文件的 MD5 值"""
-    hash_md5 = hashlib.md5()
     with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+        # 顺序读提示加大预读（仅 Linux 等平台可用）；读完特意不标
+        # DONTNEED——被哈希的多半是刚上传、马上要被设备下载的固件，
+        # 留在页缓存里正好喂第一波下载
+        if hasattr(os, 'posix_fadvise'):
+            fd = f.fileno()
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+
+        # Python 3.11+：读取循环在 C 层执行，计算期间释放 GIL
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'md5').hexdigest()
+
+        # 旧版本回退：1 MiB 复用缓冲区，避免每块重新分配
+        hash_md5 = hashlib.md5()
+        buf = bytearray(1024 * 1024)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hash_md5.update(view[:n])
+        return hash_md5.hexdigest()
 
 
 @app.route('/')
@@ -185,19 +426,20 @@ def index():
 @app.route('/api/firmware/list', methods=['GET'])
 def list_firmware():
     """获取固件列表"""
-    firmware_dir = Path(app.config['UPLOAD_FOLDER'])
-    files = []
-    
-    # 查找所有bin和zip文件
-    for pattern in ['*.bin*', '*.zip']:
-        for file_path in firmware_dir.glob(pattern):
-            if file_path.is_file():
-                files.append(get_file_info(str(file_path)))
-    
-    # 按修改时间排序
-    files.sort(key=lambda x: x['modified'], reverse=True)
+    global _LIST_CACHE
+    with _LIST_CACHE_LOCK:
+        files = _LIST_CACHE
+    if files is None:
+        files = [get_file_info(entry.path) for entry in _iter_firmware()]
+
+        # 按修改时间排序
+        files.sort(key=lambda x: x['modified'], reverse=True)
+        # 只有目录监听在跑时才缓存，否则无从得知目录何时变化
+        if _WATCHER_ACTIVE:
+            with _LIST_CACHE_LOCK:
+                _LIST_CACHE = files
     
-    return jsonify({
+    return ojson({
         'success': True,
         'files': files,
         'count': len(files)
@@ -209,22 +451,24 @@ def upload_firmware():
     """上传固件文件"""
     if 'file' not in request.files:
         logger.warning("上传请求：没有文件")
-        return jsonify({'success': False, 'error': '没有文件'}), 400
+        return ojson({'success': False, 'error': '没有文件'}, 400)
     
     file = request.files['file']
     if file.filename == '':
         logger.warning("上传请求：文件名为空")
-        return jsonify({'success': False, 'error': '文件名为空'}), 400
+        return ojson({'success': False, 'error': '文件名为空'}, 400)
     
     if not allowed_file(file.filename):
         logger.warning(f"上传请求：不支持的文件类型 - {file.filename}")
-        return jsonify({'success': False, 'error': '不支持的文件类型，仅支持 .bin、.bin.gz 和 .zip'}), 400
+        return ojson({'success': False, 'error': '不支持的文件类型，仅支持 .bin、.bin.gz 和 .zip'}, 400)
     
     try:
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
+        invalidate_file_info(filepath)
         logger.info(f"文件上传成功: {filename}")
+        _PRECOMPUTE_POOL.submit(refresh_latest_firmware)
         
         file_info = get_file_info(filepath)
         
@@ -241,10 +485,88 @@ def upload_firmware():
             'file': file_info,
             'extracted': extracted_info
         }
-        return jsonify(response)
+        return ojson(response)
     except Exception as e:
         logger.error(f"上传文件失败: {e}", exc_info=True)
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return ojson({'success': False, 'error': str(e)}, 500)
+
+
+@app.route('/api/firmware/upload_stream', methods=['POST'])
+def upload_firmware_stream():
+    """流式上传固件文件
+
+    请求体直接写入目标文件，绕过 multipart 解析和临时文件缓冲；
+    文件名由 X-Filename 请求头给出，边写边算 MD5，免去二次读取
+    """
+    filename = request.headers.get('X-Filename', '')
+    if not filename:
+        logger.warning("流式上传请求：缺少 X-Filename 请求头")
+        return ojson({'success': False, 'error': '缺少 X-Filename 请求头'}, 400)
+
+    if not allowed_file(filename):
+        logger.warning(f"流式上传请求：不支持的文件类型 - {filename}")
+        return ojson({'success': False, 'error': '不支持的文件类型，仅支持 .bin、.bin.gz 和 .zip'}, 400)
+
+    try:
+        filename = secure_filename(filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+        # 先写临时文件、成功后原子替换：中途失败（超限、断连）不会留下
+        # 半截文件被 get_latest_firmware 按 mtime 捡成"最新固件"；
+        # 临时名不带 .bin/.zip，固件遍历不会扫到它
+        fd, tmp_path = tempfile.mkstemp(prefix='.upload-',
+                                        dir=app.config['UPLOAD_FOLDER'])
+        hash_md5 = hashlib.md5()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = request.stream.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    hash_md5.update(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, filepath)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        logger.info(f"文件流式上传成功: {filename} ({size} 字节)")
+
+        # 写入时已算好 MD5，直接填充缓存，省一次全文件读取
+        stat = os.stat(filepath)
+        file_info = {
+            'name': filename,
+            'size': stat.st_size,
+            'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+            'md5': hash_md5.hexdigest()
+        }
+        with _INFO_CACHE_LOCK:
+            _INFO_CACHE[filepath] = (stat.st_mtime_ns, stat.st_size, file_info)
+
+        extracted_info = None
+        if filename.endswith('.zip') and is_zip_file(filepath):
+            extracted_bin = extract_bin_from_zip(filepath)
+            if extracted_bin:
+                extracted_info = get_file_info(extracted_bin)
+                file_info['extracted_bin'] = extracted_info
+        _PRECOMPUTE_POOL.submit(refresh_latest_firmware)
+
+        response = {
+            'success': True,
+            'message': '上传成功',
+            'file': file_info,
+            'extracted': extracted_info
+        }
+        return ojson(response)
+    except RequestEntityTooLarge:
+        raise  # 交给注册的 413 错误处理器
+    except Exception as e:
+        logger.error(f"流式上传文件失败: {e}", exc_info=True)
+        return ojson({'success': False, 'error': str(e)}, 500)
 
 
 @app.route('/api/firmware/delete', methods=['POST'])
@@ -255,22 +577,24 @@ def delete_firmware():
     
     if not filename:
         logger.warning("删除请求：文件名为空")
-        return jsonify({'success': False, 'error': '文件名不能为空'}), 400
+        return ojson({'success': False, 'error': '文件名不能为空'}, 400)
     
     filename = secure_filename(filename)
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     
     if not os.path.exists(filepath):
         logger.warning(f"删除请求：文件不存在 - {filename}")
-        return jsonify({'success': False, 'error': '文件不存在'}), 404
+        return ojson({'success': False, 'error': '文件不存在'}, 404)
     
     try:
         os.remove(filepath)
+        invalidate_file_info(filepath)
         logger.info(f"文件删除成功: {filename}")
-        return jsonify({'success': True, 'message': '删除成功'})
+        _PRECOMPUTE_POOL.submit(refresh_latest_firmware)
+        return ojson({'success': True, 'message': '删除成功'})
     except Exception as e:
         logger.error(f"删除文件失败: {e}", exc_info=True)
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return ojson({'success': False, 'error': str(e)}, 500)
 
 
 @app.route('/api/firmware/info', methods=['GET'])
@@ -279,26 +603,56 @@ def get_firmware_info():
     filename = request.args.get('filename')
     
     if not filename:
-        return jsonify({'success': False, 'error': '文件名不能为空'}), 400
+        return ojson({'success': False, 'error': '文件名不能为空'}, 400)
     
     filename = secure_filename(filename)
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     
     if not os.path.exists(filepath):
-        return jsonify({'success': False, 'error': '文件不存在'}), 404
+        return ojson({'success': False, 'error': '文件不存在'}, 404)
     
     try:
         file_info = get_file_info(filepath)
-        return jsonify({'success': True, 'file': file_info})
+        return ojson({'success': True, 'file': file_info})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return ojson({'success': False, 'error': str(e)}, 500)
 
 
 @app.route('/firmware/<filename>')
 def download_firmware(filename):
-    """下载固件文件"""
+    """下载固件文件
+
+    设置 OTA_ACCEL_REDIRECT=1 且前置 nginx 配置了
+
+        location /protected/firmware/ {
+            internal;
+            alias <固件目录绝对路径>/;
+        }
+
+    时，只回 X-Accel-Redirect 头，由 nginx 走内核 sendfile 传输，
+    Python 进程不再逐块搬运固件内容
+    """
     filename = secure_filename(filename)
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # 未走 nginx 时不必手动 wrap_file：werkzeug 的 send_file 会把文件
+    # 交给 WSGI 服务器的 wsgi.file_wrapper（gunicorn/gevent 下即
+    # sendfile(2) 零拷贝），字节不经过 Python 缓冲区
+    if app.config['USE_ACCEL_REDIRECT']:
+        if not os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+            return ojson({'success': False, 'error': '文件不存在'}, 404)
+        resp = app.response_class(status=200)
+        resp.headers['X-Accel-Redirect'] = f'/protected/firmware/{filename}'
+        resp.headers['Content-Type'] = 'application/octet-stream'
+        return resp
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    try:
+        # 强 ETag（复用缓存的 MD5），设备重启后重拉时可拿 304
+        etag = get_file_info(filepath)['md5']
+    except OSError:
+        etag = True  # 读不到就让 send_from_directory 自己生成/报 404
+    # ETag 随这唯一的一次条件处理生效：304、Range(206) 和
+    # Last-Modified 都在 send_file 的 conditional=True 那一趟里完成
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename,
+                               etag=etag)
 
 
 # ==================== 消息格式 API（设备端使用）====================
@@ -306,29 +660,20 @@ def download_firmware(filename):
 @app.route('/api/ota/check', methods=['POST'])
 def ota_check_update():
     """检查更新（消息格式）"""
+    data = None
     try:
-        data = request.get_json()
+        # 只解析一次请求体；解析失败走已有的 400 分支而不是裸异常
+        data = request.get_json(silent=True)
         log_json_message('REQUEST', '/api/ota/check', data)
         
         if not data:
-            response = {
-                'type': 'error',
-                'from': 'ota_server',
-                'to': 'unknown',
-                'timestamp': get_timestamp(),
-                'data': {
-                    'code': 1000,
-                    'message': '无效的请求格式'
-                }
-            }
-            log_json_message('RESPONSE', '/api/ota/check', response)
-            return jsonify(response), 400
+            return ota_error('/api/ota/check', 'unknown', 1000, '无效的请求格式', 400)
         
         device_id = data.get('from', 'unknown')
         current_version = data.get('current_version', '1.0.0')
         
-        latest_file = get_latest_firmware()
-        if not latest_file:
+        latest_info = get_latest_descriptor()
+        if not latest_info:
             response = {
                 'type': 'reply_update',
                 'from': 'ota_server',
@@ -337,18 +682,18 @@ def ota_check_update():
                 'respond': 0
             }
             log_json_message('RESPONSE', '/api/ota/check', response)
-            return jsonify(response)
-        
-        latest_info = get_file_info_with_version(latest_file)
+            return ojson(response)
+
         latest_version = latest_info.get('version', '1.0.0')
         
-        if latest_version > current_version:
-            base_url = request.host_url.rstrip('/')
+        if is_version_newer(latest_version, current_version):
+            base_url = BASE_URL or request.host_url.rstrip('/')
             download_filename = latest_info['name']
             file_type = 'bin'
             
             if latest_info.get('is_zip', False):
-                extracted_bin = extract_bin_from_zip(latest_file)
+                # zip 的 bin 已在上传时预提取
+                extracted_bin = latest_info.get('extracted_path')
                 if extracted_bin:
                     download_filename = os.path.basename(extracted_bin)
                     file_type = 'bin'
@@ -356,7 +701,7 @@ def ota_check_update():
                     download_filename = latest_info['name']
                     file_type = 'zip'
             
-            download_url = f"{base_url}firmware/{download_filename}"
+            download_url = f"{base_url}/firmware/{download_filename}"
             response = {
                 'type': 'reply_update',
                 'from': 'ota_server',
@@ -367,7 +712,7 @@ def ota_check_update():
                 'file_type': file_type
             }
             log_json_message('RESPONSE', '/api/ota/check', response)
-            return jsonify(response)
+            return ojson(response)
         else:
             response = {
                 'type': 'reply_update',
@@ -377,62 +722,29 @@ def ota_check_update():
                 'respond': 0
             }
             log_json_message('RESPONSE', '/api/ota/check', response)
-            return jsonify(response)
+            return ojson(response)
             
     except Exception as e:
         logger.error(f"检查更新失败: {e}", exc_info=True)
-        response = {
-            'type': 'error',
-            'from': 'ota_server',
-            'to': request.json.get('from', 'unknown') if request.json else 'unknown',
-            'timestamp': get_timestamp(),
-            'data': {
-                'code': 1000,
-                'message': str(e)
-            }
-        }
-        log_json_message('RESPONSE', '/api/ota/check', response)
-        return jsonify(response), 500
+        return ota_error('/api/ota/check', data.get('from', 'unknown') if data else 'unknown', 1000, str(e), 500)
 
 
 @app.route('/api/ota/info', methods=['POST'])
 def ota_get_firmware_info():
     """获取固件信息（消息格式）"""
+    data = None
     try:
-        data = request.get_json()
+        # 只解析一次请求体；解析失败走已有的 400 分支而不是裸异常
+        data = request.get_json(silent=True)
         log_json_message('REQUEST', '/api/ota/info', data)
         
         if not data:
-            response = {
-                'type': 'error',
-                'from': 'ota_server',
-                'to': 'unknown',
-                'timestamp': get_timestamp(),
-                'data': {
-                    'code': 1000,
-                    'message': '无效的请求格式'
-                }
-            }
-            log_json_message('RESPONSE', '/api/ota/info', response)
-            return jsonify(response), 400
+            return ota_error('/api/ota/info', 'unknown', 1000, '无效的请求格式', 400)
         
         device_id = data.get('from', 'unknown')
-        latest_file = get_latest_firmware()
-        if not latest_file:
-            response = {
-                'type': 'error',
-                'from': 'ota_server',
-                'to': device_id,
-                'timestamp': get_timestamp(),
-                'data': {
-                    'code': 1001,
-                    'message': '文件不存在'
-                }
-            }
-            log_json_message('RESPONSE', '/api/ota/info', response)
-            return jsonify(response), 404
-        
-        file_info = get_file_info_with_version(latest_file)
+        file_info = get_latest_descriptor()
+        if not file_info:
+            return ota_error('/api/ota/info', device_id, 1001, '文件不存在', 404)
         response = {
             'type': 'firmware_info',
             'from': 'ota_server',
@@ -448,82 +760,43 @@ def ota_get_firmware_info():
             }
         }
         log_json_message('RESPONSE', '/api/ota/info', response)
-        return jsonify(response)
+        resp = ojson(response)
+        # 带上 ETag，设备可据此短路后续轮询
+        resp.set_etag(file_info['md5'])
+        return resp
         
     except Exception as e:
         logger.error(f"获取固件信息失败: {e}", exc_info=True)
-        response = {
-            'type': 'error',
-            'from': 'ota_server',
-            'to': request.json.get('from', 'unknown') if request.json else 'unknown',
-            'timestamp': get_timestamp(),
-            'data': {
-                'code': 1000,
-                'message': str(e)
-            }
-        }
-        log_json_message('RESPONSE', '/api/ota/info', response)
-        return jsonify(response), 500
+        return ota_error('/api/ota/info', data.get('from', 'unknown') if data else 'unknown', 1000, str(e), 500)
 
 
 @app.route('/api/ota/request', methods=['POST'])
 def ota_request_firmware():
     """请求下载固件（消息格式）"""
+    data = None
     try:
-        data = request.get_json()
+        # 只解析一次请求体；解析失败走已有的 400 分支而不是裸异常
+        data = request.get_json(silent=True)
         log_json_message('REQUEST', '/api/ota/request', data)
         
         if not data:
-            response = {
-                'type': 'error',
-                'from': 'ota_server',
-                'to': 'unknown',
-                'timestamp': get_timestamp(),
-                'data': {
-                    'code': 1000,
-                    'message': '无效的请求格式'
-                }
-            }
-            log_json_message('RESPONSE', '/api/ota/request', response)
-            return jsonify(response), 400
+            return ota_error('/api/ota/request', 'unknown', 1000, '无效的请求格式', 400)
         
         device_id = data.get('from', 'unknown')
         request_data = data.get('data', {})
         filename = request_data.get('name')
         
         if not filename:
-            response = {
-                'type': 'error',
-                'from': 'ota_server',
-                'to': device_id,
-                'timestamp': get_timestamp(),
-                'data': {
-                    'code': 1001,
-                    'message': '文件名不能为空'
-                }
-            }
-            log_json_message('RESPONSE', '/api/ota/request', response)
-            return jsonify(response), 400
+            return ota_error('/api/ota/request', device_id, 1001, '文件名不能为空', 400)
         
         filename = secure_filename(filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         
         if not os.path.exists(filepath):
-            response = {
-                'type': 'error',
-                'from': 'ota_server',
-                'to': device_id,
-                'timestamp': get_timestamp(),
-                'data': {
-                    'code': 1001,
-                    'message': '文件不存在'
-                }
-            }
-            log_json_message('RESPONSE', '/api/ota/request', response)
-            return jsonify(response), 404
+            return ota_error('/api/ota/request', device_id, 1001, '文件不存在', 404)
         
-        base_url = request.host_url.rstrip('/')
-        download_url = f"{base_url}firmware/{filename}"
+        base_url = BASE_URL or request.host_url.rstrip('/')
+        download_url = f"{base_url}/firmware/{filename}"
         response = {
             'type': 'reply_update',
             'from': 'ota_server',
@@ -533,44 +806,24 @@ def ota_request_firmware():
             'download_url': download_url
         }
         log_json_message('RESPONSE', '/api/ota/request', response)
-        return jsonify(response)
+        return ojson(response)
         
     except Exception as e:
         logger.error(f"请求下载固件失败: {e}", exc_info=True)
-        response = {
-            'type': 'error',
-            'from': 'ota_server',
-            'to': request.json.get('from', 'unknown') if request.json else 'unknown',
-            'timestamp': get_timestamp(),
-            'data': {
-                'code': 1000,
-                'message': str(e)
-            }
-        }
-        log_json_message('RESPONSE', '/api/ota/request', response)
-        return jsonify(response), 500
+        return ota_error('/api/ota/request', data.get('from', 'unknown') if data else 'unknown', 1000, str(e), 500)
 
 
 @app.route('/api/ota/status', methods=['POST'])
 def ota_report_status():
     """报告升级状态（消息格式）"""
+    data = None
     try:
-        data = request.get_json()
+        # 只解析一次请求体；解析失败走已有的 400 分支而不是裸异常
+        data = request.get_json(silent=True)
         log_json_message('REQUEST', '/api/ota/status', data)
         
         if not data:
-            response = {
-                'type': 'error',
-                'from': 'ota_server',
-                'to': 'unknown',
-                'timestamp': get_timestamp(),
-                'data': {
-                    'code': 1000,
-                    'message': '无效的请求格式'
-                }
-            }
-            log_json_message('RESPONSE', '/api/ota/status', response)
-            return jsonify(response), 400
+            return ota_error('/api/ota/status', 'unknown', 1000, '无效的请求格式', 400)
         
         device_id = data.get('from', 'unknown')
         status_data = data.get('data', {})
@@ -598,40 +851,32 @@ def ota_report_status():
             'respond': 0
         }
         log_json_message('RESPONSE', '/api/ota/status', response)
-        return jsonify(response)
+        return ojson(response)
         
     except Exception as e:
         logger.error(f"报告状态失败: {e}", exc_info=True)
-        response = {
-            'type': 'error',
-            'from': 'ota_server',
-            'to': request.json.get('from', 'unknown') if request.json else 'unknown',
-            'timestamp': get_timestamp(),
-            'data': {
-                'code': 1000,
-                'message': str(e)
-            }
-        }
-        log_json_message('RESPONSE', '/api/ota/status', response)
-        return jsonify(response), 500
+        return ota_error('/api/ota/status', data.get('from', 'unknown') if data else 'unknown', 1000, str(e), 500)
 
 
 @app.errorhandler(RequestEntityTooLarge)
 def handle_file_too_large(e):
     """处理文件过大错误"""
-    return jsonify({'success': False, 'error': '文件太大，最大支持 16MB'}), 413
+    return ojson({'success': False, 'error': '文件太大，最大支持 16MB'}, 413)
 
 
 @app.errorhandler(404)
 def not_found(e):
     """处理 404 错误"""
-    return jsonify({'success': False, 'error': '接口不存在'}), 404
+    return ojson({'success': False, 'error': '接口不存在'}, 404)
 
 
 @app.errorhandler(500)
 def internal_error(e):
     """处理 500 错误"""
-    return jsonify({'success': False, 'error': '服务器内部错误'}), 500
+    return ojson({'success': False, 'error': '服务器内部错误'}, 500)
+
+
+start_firmware_watcher()
 
 
 if __name__ == '__main__':
@@ -641,6 +886,9 @@ if __name__ == '__main__':
     logger.info(f"固件目录: {os.path.abspath(app.config['UPLOAD_FOLDER'])}")
     logger.info(f"访问地址: http://localhost:5000")
     logger.info("=" * 60)
+    logger.info("提示: 生产环境请用 gunicorn -c gunicorn_conf.py ota_server:app")
+    logger.info("=" * 60)
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # 直接运行走开发服务器；debug/reloader 只在 DEV=1 时开启
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('DEV') == '1')
 
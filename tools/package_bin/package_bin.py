@@ -8,18 +8,61 @@ ESP32 固件打包脚本
 import os
 import sys
 import json
+import time
 import shutil
 import hashlib
+import zipfile
 import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
+# orjson 是 C 实现的 JSON 编解码器，未安装时退回标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# MD5 读取块大小：1 MiB，减少系统调用次数和 Python 循环开销
+_MD5_BUFSIZE = 1 << 20
+
+# 时间格式串，清单和文件信息共用一份
+_FMT_TS = '%Y-%m-%d %H:%M:%S'
+
+
+def _json_dumps(data) -> bytes:
+    """序列化成带缩进的 JSON 字节串（优先 orjson）"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(raw: bytes):
+    """解析 JSON 字节串（优先 orjson）"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+@functools.lru_cache(maxsize=16)
+def _load_flasher_args_cached(path_str: str, mtime_ns: int):
+    """读取并解析 flasher_args.json
+
+    按 路径+mtime 缓存，同一构建目录反复实例化时不重读不重解析；
+    原始字节一并返回，复制进发布包时直接写出
+    """
+    with open(path_str, 'rb') as f:
+        raw = f.read()
+    return raw, _json_loads(raw)
+
 
 class BinPackager:
     """Bin文件打包器"""
     
-    def __init__(self, build_dir: str, output_dir: str = "release", version: Optional[str] = None):
+    def __init__(self, build_dir: str, output_dir: str = "release", version: Optional[str] = None,
+                 hash_algo: str = "sha256"):
         """
         初始化打包器
         
@@ -27,68 +70,234 @@ class BinPackager:
             build_dir: build目录路径
             output_dir: 输出目录路径
             version: 版本号（如果为None，则从时间戳生成）
+            hash_algo: 校验和算法（默认 sha256，可走 SHA-NI 硬件指令）
         """
         self.build_dir = Path(build_dir)
         self.output_dir = Path(output_dir)
         self.version = version or self._generate_version()
+        self.hash_algo = hash_algo
+        # 打包创建时间只格式化一次，清单多次生成时复用
+        self._created_at = datetime.now().strftime(_FMT_TS)
+        # 哈希构造器和 build 目录字符串解析一次，热循环里不再做属性查找
+        self._new_hasher = getattr(hashlib, hash_algo, None) \
+            or functools.partial(hashlib.new, hash_algo)
+        self._build_dir_str = str(self.build_dir)
         self.package_name = f"EmotiPet_v{self.version}"
         self.package_dir = self.output_dir / self.package_name
         
+        # 进度输出先缓冲，打包结束一次写出（见 _log/_flush_log）
+        self._log_lines: List[str] = []
+        
         # 从 flasher_args.json 读取文件信息
+        self._flasher_args_raw = b''
         self.flasher_args = self._load_flasher_args()
+        # 上次打包的清单：重复打包未变的文件按 (size, mtime_ns) 复用校验和
+        self._prev_files = {}
+        try:
+            with open(self.package_dir / "manifest.json", 'rb') as f:
+                prev = _json_loads(f.read())
+            if prev.get('package', {}).get('hash_algo', 'md5') == self.hash_algo:
+                self._prev_files = {
+                    item['path']: item
+                    for item in prev.get('files', [])
+                    if 'mtime_ns' in item
+                }
+        except (OSError, ValueError):
+            pass
+        
+        # 反向映射：文件路径 -> 烧录地址，单次遍历构建，查地址时 O(1)
+        self._path_to_offset = {}
+        for addr, path in self.flasher_args.get('flash_files', {}).items():
+            if path in self._path_to_offset:
+                print(f"警告: flash_files 中路径重复: {path} "
+                      f"({self._path_to_offset[path]} 与 {addr})")
+                continue
+            self._path_to_offset[path] = addr
         
     def _load_flasher_args(self) -> Dict:
         """加载 flasher_args.json"""
         flasher_args_path = self.build_dir / "flasher_args.json"
-        if not flasher_args_path.exists():
+        try:
+            stat = os.stat(flasher_args_path)
+        except FileNotFoundError:
             print(f"警告: 未找到 {flasher_args_path}")
             return {}
         
         try:
-            with open(flasher_args_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            raw, parsed = _load_flasher_args_cached(str(flasher_args_path),
+                                                    stat.st_mtime_ns)
         except Exception as e:
             print(f"错误: 无法读取 flasher_args.json: {e}")
             return {}
+        self._flasher_args_raw = raw
+        return parsed
+    
+    def _log(self, msg: str = ""):
+        """缓冲一条进度输出（错误和警告仍直接 print）"""
+        self._log_lines.append(msg)
+    
+    def _flush_log(self):
+        """把缓冲的进度输出一次性写到 stdout，减少写系统调用"""
+        if self._log_lines:
+            sys.stdout.write('\n'.join(self._log_lines) + '\n')
+            sys.stdout.flush()
+            self._log_lines.clear()
     
     def _generate_version(self) -> str:
         """生成版本号（基于时间戳）"""
         now = datetime.now()
         return now.strftime("%Y%m%d_%H%M%S")
     
-    def calculate_md5(self, filepath: Path) -> str:
-        """计算文件的MD5值"""
-        hash_md5 = hashlib.md5()
+    def _digest_fd(self, f) -> str:
+        """对一个已打开的二进制文件对象计算校验和"""
+        # Python 3.11+：整个读取+更新循环在 C 层完成，期间释放 GIL
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, self._new_hasher).hexdigest()
+
+        # 旧版本回退：1 MiB 复用缓冲区减少分配
+        hasher = self._new_hasher()
+        buf = bytearray(_MD5_BUFSIZE)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+        return hasher.hexdigest()
+
+    def calculate_digest(self, filepath: Path) -> str:
+        """计算文件的校验和（算法由 hash_algo 决定）"""
         try:
-            with open(filepath, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+            # buffering=0 跳过一层缓冲，直接读进复用缓冲区
+            with open(filepath, "rb", buffering=0) as f:
+                return self._digest_fd(f)
         except Exception as e:
-            print(f"错误: 无法计算 {filepath} 的MD5: {e}")
+            print(f"错误: 无法计算 {filepath} 的校验和: {e}")
             return ""
+
+    def _stat_and_digest(self, rel_path: str, filepath: Path):
+        """打开一次文件，返回 (stat, digest)
+
+        元数据从已打开的 fd 上 os.fstat 获取，省掉独立的 stat 探测；
+        (size, mtime_ns) 命中上次清单时直接复用校验和，不读内容。
+        文件不存在时返回 (None, None)。
+        """
+        try:
+            with open(filepath, "rb", buffering=0) as f:
+                stat = os.fstat(f.fileno())
+                digest = self._cached_digest(rel_path, stat)
+                if digest is None:
+                    digest = self._digest_fd(f)
+                return stat, digest
+        except FileNotFoundError:
+            return None, None
     
-    def get_file_info(self, filepath: Path) -> Dict:
-        """获取文件信息"""
-        if not filepath.exists():
-            return {}
+    # 旧名字保留为别名
+    calculate_md5 = calculate_digest
+    
+    def _cached_digest(self, rel_path: str, stat: os.stat_result) -> Optional[str]:
+        """上次清单里 (size, mtime_ns) 未变时返回已算好的校验和，否则 None"""
+        prev = self._prev_files.get(rel_path)
+        if prev and prev.get('size') == stat.st_size \
+                and prev.get('mtime_ns') == stat.st_mtime_ns:
+            return prev.get(self.hash_algo)
+        return None
+    
+    def _copy_and_digest(self, src: Path, dst: Path):
+        """复制文件并在同一趟读取里计算校验和，返回 (size, digest)
+
+        源文件只读一遍，省掉先哈希后复制的第二次全文件读取
+        """
+        hasher = self._new_hasher()
+        buf = bytearray(_MD5_BUFSIZE)
+        view = memoryview(buf)
+        with open(src, "rb", buffering=0) as fin, open(dst, "wb") as fout:
+            while True:
+                n = fin.readinto(buf)
+                if not n:
+                    break
+                hasher.update(view[:n])
+                fout.write(view[:n])
+            size = os.fstat(fin.fileno()).st_size
+        return size, hasher.hexdigest()
+    
+    def _fast_copy(self, src: Path, dst: Path) -> int:
+        """内核侧复制文件，返回复制的字节数
+
+        Linux 上优先 copy_file_range（同文件系统可在内核里直接搬数据），
+        退回 sendfile，最后退回用户态分块复制
+        """
+        with open(src, "rb") as fin, open(dst, "wb") as fout:
+            src_fd = fin.fileno()
+            dst_fd = fout.fileno()
+            size = os.fstat(src_fd).st_size
+            
+            if hasattr(os, 'copy_file_range'):
+                try:
+                    copied = 0
+                    while copied < size:
+                        n = os.copy_file_range(src_fd, dst_fd, size - copied)
+                        if not n:
+                            break
+                        copied += n
+                    if copied == size:
+                        return size
+                except OSError:
+                    pass
+                fin.seek(0)
+                fout.seek(0)
+                fout.truncate()
+            
+            if hasattr(os, 'sendfile'):
+                try:
+                    copied = 0
+                    while copied < size:
+                        n = os.sendfile(dst_fd, src_fd, copied, size - copied)
+                        if not n:
+                            break
+                        copied += n
+                    if copied == size:
+                        return size
+                except OSError:
+                    pass
+                fin.seek(0)
+                fout.seek(0)
+                fout.truncate()
+            
+            shutil.copyfileobj(fin, fout, length=_MD5_BUFSIZE)
+            return size
+    
+    def get_file_info(self, filepath: Path, md5: Optional[str] = None,
+                      stat: Optional[os.stat_result] = None) -> Dict:
+        """获取文件信息（md5/stat 已有时可直接传入，避免重复读文件和 stat）"""
+        if stat is None:
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                return {}
         
-        stat = filepath.stat()
-        return {
+        info = {
             'name': filepath.name,
-            'path': str(filepath.relative_to(self.build_dir)),
+            # 字符串切片代替 relative_to，省去构造中间 Path 对象
+            'path': str(filepath)[len(self._build_dir_str) + 1:],
             'size': stat.st_size,
-            'md5': self.calculate_md5(filepath),
-            'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+            'mtime_ns': stat.st_mtime_ns,
+            # 'md5' 键名保留作兼容别名，实际算法见 manifest 的 hash_algo
+            self.hash_algo: md5 if md5 is not None else self.calculate_digest(filepath),
+            # time.strftime 直接格式化，不用为每个文件构造 datetime 对象
+            'modified': time.strftime(_FMT_TS, time.localtime(stat.st_mtime))
         }
+        if self.hash_algo != 'md5':
+            info['md5'] = info[self.hash_algo]
+        return info
     
-    def collect_bin_files(self) -> List[Dict]:
-        """收集所有需要打包的bin文件"""
+    def collect_bin_files(self, compute_md5: bool = True) -> List[Dict]:
+        """收集所有需要打包的bin文件
+
+        compute_md5=False 时跳过哈希（调用方会在复制时顺带计算）
+        """
         bin_files = []
         
-        # 从 flasher_args.json 获取文件列表
-        flash_files = self.flasher_args.get('flash_files', {})
-        
         # 需要打包的文件列表
         files_to_package = {
             'bootloader': 'bootloader/bootloader.bin',
@@ -97,57 +306,92 @@ class BinPackager:
             'otadata': 'ota_data_initial.bin'
         }
         
-        for file_type, file_path in files_to_package.items():
-            file_full_path = self.build_dir / file_path
-            
-            if not file_full_path.exists():
-                print(f"警告: 文件不存在: {file_full_path}")
-                continue
-            
-            file_info = self.get_file_info(file_full_path)
+        entries = [(file_type, file_path, self.build_dir / file_path)
+                   for file_type, file_path in files_to_package.items()]
+
+        collected = []
+        if compute_md5:
+            # 每个文件只 open 一次，元数据走 fstat，省掉独立的 stat 探测；
+            # 未变的文件复用上次清单的校验和，变过的就着同一个 fd 计算
+            # （hashlib 在 update 期间释放 GIL，多个文件的哈希并行算）
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                results = pool.map(lambda e: self._stat_and_digest(e[1], e[2]),
+                                   entries)
+                for (file_type, file_path, file_full_path), (stat, digest) \
+                        in zip(entries, results):
+                    if stat is None:
+                        print(f"警告: 文件不存在: {file_full_path}")
+                        continue
+                    collected.append((file_type, file_path, file_full_path,
+                                      stat, digest))
+        else:
+            # 跳过哈希时不用打开文件，stat 探测即可（复制阶段才读内容）
+            for file_type, file_path, file_full_path in entries:
+                try:
+                    stat = os.stat(file_full_path)
+                except FileNotFoundError:
+                    print(f"警告: 文件不存在: {file_full_path}")
+                    continue
+                collected.append((file_type, file_path, file_full_path, stat, ''))
+
+        for file_type, file_path, file_full_path, stat, md5 in collected:
+            file_info = self.get_file_info(file_full_path, md5=md5, stat=stat)
             if file_info:
                 # 添加烧录地址信息
-                offset = None
-                for addr, path in flash_files.items():
-                    if path == file_path:
-                        offset = addr
-                        break
+                offset = self._path_to_offset.get(file_path)
                 
                 file_info['type'] = file_type
                 file_info['offset'] = offset
                 bin_files.append(file_info)
-                print(f"找到文件: {file_path} ({file_info['size']} 字节)")
+                self._log(f"找到文件: {file_path} ({file_info['size']} 字节)")
         
         return bin_files
     
     def create_package(self, compress: bool = False) -> bool:
         """创建打包文件"""
-        print(f"\n{'='*60}")
-        print(f"开始打包固件")
-        print(f"{'='*60}")
-        print(f"版本号: {self.version}")
-        print(f"Build目录: {self.build_dir}")
-        print(f"输出目录: {self.package_dir}")
+        self._log(f"\n{'='*60}")
+        self._log(f"开始打包固件")
+        self._log(f"{'='*60}")
+        self._log(f"版本号: {self.version}")
+        self._log(f"Build目录: {self.build_dir}")
+        self._log(f"输出目录: {self.package_dir}")
         
-        # 创建输出目录
-        self.package_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 收集bin文件
-        bin_files = self.collect_bin_files()
+        # 收集bin文件（MD5 留到复制时顺带计算，文件只读一遍）
+        bin_files = self.collect_bin_files(compute_md5=False)
         if not bin_files:
+            self._flush_log()
             print("错误: 未找到任何bin文件")
             return False
         
+        # --compress 时不落中间目录：复制、哈希、归档一趟直写 zip
+        if compress:
+            return self._create_package_zip(bin_files)
+        
+        # 创建输出目录
+        self.package_dir.mkdir(parents=True, exist_ok=True)
+        
         # 复制文件
-        print(f"\n复制文件到打包目录...")
+        self._log(f"\n复制文件到打包目录...")
         for file_info in bin_files:
             src_path = self.build_dir / file_info['path']
             dst_path = self.package_dir / file_info['name']
             
             try:
-                shutil.copy2(src_path, dst_path)
-                print(f"  ✓ {file_info['name']}")
+                prev = self._prev_files.get(file_info['path'])
+                if prev and prev.get('size') == file_info['size'] \
+                        and prev.get('mtime_ns') == file_info['mtime_ns']:
+                    # 校验和可复用：走内核零拷贝，字节不进用户态
+                    size = self._fast_copy(src_path, dst_path)
+                    digest = prev[self.hash_algo]
+                else:
+                    # 复制和哈希融合成一趟读取
+                    size, digest = self._copy_and_digest(src_path, dst_path)
+                file_info['size'] = size
+                file_info[self.hash_algo] = digest
+                file_info['md5'] = digest
+                self._log(f"  ✓ {file_info['name']}")
             except Exception as e:
+                self._flush_log()
                 print(f"  ✗ 复制失败 {file_info['name']}: {e}")
                 return False
         
@@ -155,41 +399,94 @@ class BinPackager:
         manifest = self._generate_manifest(bin_files)
         manifest_path = self.package_dir / "manifest.json"
         try:
-            with open(manifest_path, 'w', encoding='utf-8') as f:
-                json.dump(manifest, f, indent=2, ensure_ascii=False)
-            print(f"\n✓ 生成清单文件: manifest.json")
+            manifest_path.write_bytes(_json_dumps(manifest))
+            self._log(f"\n✓ 生成清单文件: manifest.json")
         except Exception as e:
+            self._flush_log()
             print(f"✗ 生成清单文件失败: {e}")
             return False
         
-        # 复制 flasher_args.json（如果存在）
-        flasher_args_path = self.build_dir / "flasher_args.json"
-        if flasher_args_path.exists():
+        # 复制 flasher_args.json（如果存在）：初始化时已读过，直接写出缓存的字节
+        if self._flasher_args_raw:
             try:
-                shutil.copy2(flasher_args_path, self.package_dir / "flasher_args.json")
-                print(f"✓ 复制 flasher_args.json")
+                (self.package_dir / "flasher_args.json").write_bytes(self._flasher_args_raw)
+                self._log(f"✓ 复制 flasher_args.json")
             except Exception as e:
+                self._flush_log()
                 print(f"✗ 复制 flasher_args.json 失败: {e}")
         
         # 生成README
         readme_path = self.package_dir / "README.txt"
         self._generate_readme(readme_path, manifest)
-        print(f"✓ 生成 README.txt")
+        self._log(f"✓ 生成 README.txt")
         
-        # 压缩（如果需要）
-        if compress:
-            archive_path = self._create_archive()
-            if archive_path:
-                print(f"\n✓ 创建压缩包: {archive_path}")
-                # 可选：删除原始目录
-                # shutil.rmtree(self.package_dir)
+        self._log(f"\n{'='*60}")
+        self._log(f"打包完成!")
+        self._log(f"输出目录: {self.package_dir}")
+        self._log(f"{'='*60}\n")
+        self._flush_log()
         
-        print(f"\n{'='*60}")
-        print(f"打包完成!")
-        print(f"输出目录: {self.package_dir}")
-        if compress:
-            print(f"压缩包: {archive_path}")
-        print(f"{'='*60}\n")
+        return True
+    
+    def _create_package_zip(self, bin_files: List[Dict]) -> bool:
+        """流式直写压缩包：每个 bin 读一遍，同时完成哈希和归档
+
+        不生成中间打包目录，清单和 README 在收齐校验和后用
+        writestr 直接写入 zip
+        """
+        archive_path = self.output_dir / f"{self.package_name}.zip"
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            # EAFP：直接删，不存在就算了，省一次 stat
+            archive_path.unlink(missing_ok=True)
+
+            buf = bytearray(_MD5_BUFSIZE)
+            view = memoryview(buf)
+            self._log(f"\n写入压缩包...")
+            with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_STORED,
+                                 allowZip64=True) as zf:
+                for file_info in bin_files:
+                    src_path = self.build_dir / file_info['path']
+                    arcname = f"{self.package_name}/{file_info['name']}"
+                    hasher = self._new_hasher()
+                    size = 0
+                    with open(src_path, "rb", buffering=0) as fin, \
+                            zf.open(arcname, 'w', force_zip64=True) as zout:
+                        while True:
+                            n = fin.readinto(buf)
+                            if not n:
+                                break
+                            hasher.update(view[:n])
+                            zout.write(view[:n])
+                            size += n
+                    file_info[self.hash_algo] = hasher.hexdigest()
+                    file_info['md5'] = file_info[self.hash_algo]
+                    file_info['size'] = size
+                    self._log(f"  ✓ {file_info['name']}")
+                
+                manifest = self._generate_manifest(bin_files)
+                zf.writestr(f"{self.package_name}/manifest.json",
+                            _json_dumps(manifest))
+                self._log(f"\n✓ 生成清单文件: manifest.json")
+                
+                if self._flasher_args_raw:
+                    zf.writestr(f"{self.package_name}/flasher_args.json",
+                                self._flasher_args_raw)
+                    self._log(f"✓ 复制 flasher_args.json")
+                
+                zf.writestr(f"{self.package_name}/README.txt",
+                            self._readme_content(manifest))
+                self._log(f"✓ 生成 README.txt")
+        except Exception as e:
+            self._flush_log()
+            print(f"错误: 创建压缩包失败: {e}")
+            return False
+        
+        self._log(f"\n{'='*60}")
+        self._log(f"打包完成!")
+        self._log(f"压缩包: {archive_path}")
+        self._log(f"{'='*60}\n")
+        self._flush_log()
         
         return True
     
@@ -199,9 +496,10 @@ class BinPackager:
             'package': {
                 'name': self.package_name,
                 'version': self.version,
-                'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'created': self._created_at,
                 'target': 'ESP32-S3',
-                'description': 'EmotiPet 固件发布包'
+                'description': 'EmotiPet 固件发布包',
+                'hash_algo': self.hash_algo
             },
             'files': bin_files,
             'flash_info': {
@@ -214,24 +512,31 @@ class BinPackager:
     
     def _generate_readme(self, readme_path: Path, manifest: Dict):
         """生成README文件"""
-        readme_content = f"""EmotiPet 固件发布包
+        try:
+            readme_path.write_text(self._readme_content(manifest), encoding='utf-8')
+        except Exception as e:
+            print(f"警告: 无法生成README文件: {e}")
+    
+    def _readme_content(self, manifest: Dict) -> str:
+        """构造README文本（列表累积 + join，避免字符串反复拼接复制）"""
+        parts = [f"""EmotiPet 固件发布包
 版本: {manifest['package']['version']}
 创建时间: {manifest['package']['created']}
 目标芯片: {manifest['package']['target']}
 
 文件列表:
-"""
+"""]
         for file_info in manifest['files']:
-            readme_content += f"""
+            parts.append(f"""
 - {file_info['name']}
   类型: {file_info['type']}
   大小: {file_info['size']} 字节
-  MD5: {file_info['md5']}
+  校验和({manifest['package']['hash_algo']}): {file_info['md5']}
   烧录地址: {file_info.get('offset', 'N/A')}
   修改时间: {file_info['modified']}
-"""
+""")
         
-        readme_content += f"""
+        parts.append(f"""
 烧录配置:
   模式: {manifest['flash_info']['flash_mode']}
   大小: {manifest['flash_info']['flash_size']}
@@ -249,36 +554,9 @@ class BinPackager:
     0x8000 partition-table.bin \\
     0xd000 ota_data_initial.bin \\
     0x20000 EmotiPet.bin
-"""
-        
-        try:
-            with open(readme_path, 'w', encoding='utf-8') as f:
-                f.write(readme_content)
-        except Exception as e:
-            print(f"警告: 无法生成README文件: {e}")
-    
-    def _create_archive(self) -> Optional[Path]:
-        """创建压缩包"""
-        try:
-            archive_format = 'zip'
-            archive_name = f"{self.package_name}.{archive_format}"
-            archive_path = self.output_dir / archive_name
-            
-            # 如果压缩包已存在，先删除
-            if archive_path.exists():
-                archive_path.unlink()
-            
-            shutil.make_archive(
-                str(self.output_dir / self.package_name),
-                archive_format,
-                self.output_dir,
-                self.package_name
-            )
-            
-            return archive_path
-        except Exception as e:
-            print(f"错误: 创建压缩包失败: {e}")
-            return None
+""")
+
+        return ''.join(parts)
 
 
 def main():
@@ -329,6 +607,13 @@ def main():
         help='创建压缩包'
     )
     
+    parser.add_argument(
+        '--hash-algo',
+        type=str,
+        default='sha256',
+        help='校验和算法（默认: sha256，可选 md5 等 hashlib 支持的算法）'
+    )
+    
     args = parser.parse_args()
     
     # 检查build目录是否存在
@@ -342,7 +627,8 @@ def main():
     packager = BinPackager(
         build_dir=str(build_dir.absolute()),
         output_dir=args.output_dir,
-        version=args.version
+        version=args.version,
+        hash_algo=args.hash_algo
     )
     
     if packager.create_package(compress=args.compress):